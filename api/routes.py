@@ -1,9 +1,12 @@
+import asyncio
 import os
 import shutil
-import tempfile
-from enum import Enum
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from bson.objectid import ObjectId
+from fastapi import APIRouter, Header, HTTPException, UploadFile, File
+from pydantic import BaseModel, Field
 
 from services.document_processor.document_classification import DocumentType
 from services.document_processor.processor import (
@@ -12,9 +15,35 @@ from services.document_processor.processor import (
     process_document,
     DocumentProcessingResponse,
 )
+from services import stats_service
+from services.document_store import DocumentWrite, StoredImage, image_urls, store_document
+from services.phash_index import NearDuplicate, PerceptualHashIndex, compute_dhash, to_hex
 from services.s3_service import S3Service
+from services.write_journal import WriteJournal
 from models.extracted_document_data import ExtractedDocumentData
+from config.redis import get_redis
 from config.settings import settings
+from utils.llm_scheduler import (
+    DEFAULT_TENANT,
+    AdmissionRejectedError,
+    Priority,
+    llm_scheduler,
+    set_request_context,
+)
+from utils.memory_budget import (
+    MemoryBudgetExceededError,
+    ReservationTooLargeError,
+    image_memory_budget,
+)
+from utils.model_router import model_router
+from utils.serialization import FastJSONResponse
+from utils.single_flight import SingleFlight
+from utils.upload_utils import (
+    StreamedUpload,
+    UnsupportedImageTypeError,
+    UploadTooLargeError,
+    stream_upload_to_temp_file,
+)
 
 
 router = APIRouter()
@@ -22,92 +51,169 @@ s3_service = S3Service(
     bucket_name=settings.document_images_s3_bucket_name,
     aws_region=settings.s3_region
 )
+write_journal = WriteJournal(
+    settings.write_journal_dir,
+    apply=lambda write: store_document(write, s3_service),
+    max_attempts=settings.write_journal_max_attempts,
+)
+phash_index = PerceptualHashIndex(max_distance=settings.phash_max_distance)
+document_single_flight = SingleFlight(
+    namespace="process-document",
+    redis_client=get_redis() if settings.single_flight_use_redis else None,
+    lock_ttl=settings.single_flight_lock_ttl_seconds,
+)
 
 
-@router.post("/process")
-async def process_document_route(
-    file: UploadFile = File(...),
-):
+class DocumentReview(BaseModel):
+    document_id: str
+    rejected: bool = False
+    corrections: Dict[str, str] = Field(default_factory=dict)
+
+
+class BulkReviewRequest(BaseModel):
+    reviews: List[DocumentReview]
+
+
+async def _find_near_duplicates(image_path: str) -> Tuple[Optional[int], List[NearDuplicate]]:
+    """Hash the image and look up stored documents that are perceptually near-identical"""
+    if not settings.phash_enabled or not phash_index.enabled:
+        return None, []
+    perceptual_hash = await asyncio.to_thread(compute_dhash, image_path)
+    if perceptual_hash is None:
+        return None, []
+    return perceptual_hash, phash_index.lookup(perceptual_hash)
+
+
+async def _process_upload(uploads: List[StreamedUpload]) -> dict:
     """
-    Process the image of an uploaded document and extract relevant data.
+    Run the processing pipeline on the uploaded images of one document, store the images
+    and extracted data, and return the JSON-serializable response body.
 
-    :param file: The image file of the document to process
-    :return: Extracted document data
+    Near-duplicates of stored documents (by perceptual hash of the first image) are flagged
+    for review. Their extraction is never reused: the hash captures the card's layout far
+    more than the personal data printed on it.
     """
-    if not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="File must be an image")
+    image_paths = [upload.path for upload in uploads]
+    # Only the single-flight leader holds image buffers, so the reservation is made here
+    async with image_memory_budget.reserve(sum(upload.size for upload in uploads)):
+        perceptual_hash, near_duplicates = await _find_near_duplicates(image_paths[0])
+        result = await process_document(image_paths if len(image_paths) > 1 else image_paths[0])
+
+    if result.document_type in [
+        DocumentType.INDECIPHERABLE_DOCUMENT,
+        DocumentType.NOT_A_DOCUMENT,
+    ]:
+        return result.model_dump(mode="json")
 
-    file_extension = os.path.splitext(file.filename)[1] if file.filename else '.jpg'
-    temp_file_path = None
+    document_type = result.document_type.value
+    serialized_extracted_data = (
+        result.extracted_data.model_dump(mode="json") if result.extracted_data else {}
+    )
+    field_sources = result.field_sources or {}
+    metadata = result.metadata.model_dump(mode="json") if result.metadata else {}
 
+    confidence_values = [
+        field.get("confidence")
+        for field in serialized_extracted_data.values()
+        if isinstance(field, dict) and "confidence" in field
+    ]
+    needs_manual_review = any(
+        confidence == "unsure" for confidence in confidence_values
+    )
+    # A near-duplicate of another document is a possible resubmission of the same ID
+    if near_duplicates:
+        needs_manual_review = True
+
+    write = DocumentWrite(
+        document_id=str(ObjectId()),
+        artifact_id=str(ObjectId()),
+        document_type=document_type,
+        extracted_data=serialized_extracted_data,
+        needs_manual_review=needs_manual_review,
+        field_sources=field_sources,
+        metadata=metadata,
+        images=[StoredImage(path=upload.path, sha256=upload.sha256) for upload in uploads],
+        perceptual_hash=to_hex(perceptual_hash) if perceptual_hash is not None else None,
+        near_duplicate_of=[match.document_id for match in near_duplicates],
+    )
+
+    # If storage fails, keep the (already paid for) results in the journal and retry
+    # the writes in the background rather than failing the request
     try:
-        with tempfile.NamedTemporaryFile(suffix=file_extension, delete=False) as temp_file:
-            temp_file_path = temp_file.name
-            await file.seek(0)
-            content = await file.read()
-            temp_file.write(content)
-            temp_file.flush()
-            os.fsync(temp_file.fileno())
-
-        result = await process_document(temp_file_path)
-
-        if result.document_type not in [
-            DocumentType.INDECIPHERABLE_DOCUMENT,
-            DocumentType.NOT_A_DOCUMENT,
-        ]:
-            if not os.path.exists(temp_file_path) or os.path.getsize(temp_file_path) == 0:
-                raise HTTPException(
-                    status_code=500,
-                    detail="Error processing document: Temporary file is missing or empty"
-                )
+        s3_urls = store_document(write, s3_service)
+        storage_status = "stored"
+    except Exception as e:
+        print(f"Error storing document {write.document_id}: {str(e)}")
+        write_journal.enqueue(write, error=str(e))
+        s3_urls = image_urls(write, s3_service)
+        storage_status = "pending"
 
-            s3_url = s3_service.upload_document(
-                temp_file_path,
-                result.document_type.value
-            )
+    if perceptual_hash is not None:
+        phash_index.add(perceptual_hash, write.document_id)
 
-            if not s3_url:
-                raise HTTPException(
-                    status_code=500,
-                    detail="Error processing document: Failed to upload to S3"
-                )
+    response = {
+        "document_type": document_type,
+        "extracted_data": serialized_extracted_data,
+        "needs_manual_review": needs_manual_review,
+        "document_image_s3_url": s3_urls[0],
+        "document_id": write.document_id,
+        "storage_status": storage_status,
+        "near_duplicate_of": write.near_duplicate_of,
+    }
+    if len(uploads) > 1:
+        response["additional_image_s3_urls"] = s3_urls[1:]
+        response["field_sources"] = field_sources
+    return response
 
-            extracted_data = result.extracted_data.dict() if result.extracted_data else {}
-            metadata = result.metadata.dict() if result.metadata else {}
-            serialized_extracted_data = {
-                field: {
-                    k: v.value if isinstance(v, Enum) else v
-                    for k, v in field_data.items()
-                }
-                for field, field_data in extracted_data.items()
-            }
-            confidence_values = [
-                field.get("confidence")
-                for field in serialized_extracted_data.values()
-                if isinstance(field, dict) and "confidence" in field
-            ]
-            needs_manual_review = any(
-                confidence == "unsure" for confidence in confidence_values
-            )
 
-            document_data = ExtractedDocumentData(
-                document_type=result.document_type.value,
-                extracted_data=serialized_extracted_data,
-                document_image_s3_url=s3_url,
-                needs_manual_review=needs_manual_review,
-            )
-            document_data.save()
+async def _handle_process_request(
+    files: List[UploadFile],
+    tenant_id: str,
+    priority: Priority,
+) -> FastJSONResponse:
+    """Admit, stream and process the uploaded images of one document"""
+    try:
+        llm_scheduler.check_admission(priority)
+    except AdmissionRejectedError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    set_request_context(priority, tenant_id)
 
-            return {
-                "document_type": result.document_type.value,
-                "extracted_data": serialized_extracted_data,
-                "needs_manual_review": needs_manual_review,
-                "document_image_s3_url": s3_url,
-                "document_id": str(document_data.id),
-            }
+    # Whole-request size limits are enforced by RequestSizeLimitMiddleware before the form
+    # is parsed; this is the per-file limit
 
-        return result
+    uploads: List[StreamedUpload] = []
 
+    try:
+        for file in files:
+            uploads.append(
+                await stream_upload_to_temp_file(
+                    file,
+                    max_bytes=settings.max_upload_bytes,
+                    chunk_size=settings.upload_chunk_size,
+                )
+            )
+
+        # Image order matters (front/back), so the key is the ordered list of hashes
+        key = "-".join(upload.sha256 for upload in uploads)
+        response = await document_single_flight.do(key, lambda: _process_upload(uploads))
+        return FastJSONResponse(response)
+
+    except UnsupportedImageTypeError:
+        raise HTTPException(status_code=415, detail="File must be a JPEG, PNG, WebP or HEIC image")
+    except UploadTooLargeError:
+        raise HTTPException(status_code=413, detail="File is too large")
+    except ReservationTooLargeError:
+        raise HTTPException(status_code=413, detail="Images are too large to process together")
+    except MemoryBudgetExceededError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy processing other images, please retry",
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except UnsupportedDocumentTypeError:
         raise HTTPException(status_code=422, detail="Unsupported document type")
     except DocumentNotRecognizedError:
@@ -118,26 +224,71 @@ async def process_document_route(
             detail=f"Error processing document: {str(e)}"
         )
     finally:
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-            except Exception as e:
-                print(f"Error cleaning up temp file: {str(e)}")
-                pass  # Ignore cleanup errors
+        for upload in uploads:
+            if os.path.exists(upload.path):
+                try:
+                    os.unlink(upload.path)
+                except Exception as e:
+                    print(f"Error cleaning up temp file: {str(e)}")
+                    pass  # Ignore cleanup errors
+
+
+@router.post("/process")
+async def process_document_route(
+    file: UploadFile = File(...),
+    x_tenant_id: str = Header(DEFAULT_TENANT),
+    x_priority: Priority = Header(Priority.INTERACTIVE),
+):
+    """
+    Process the image of an uploaded document and extract relevant data.
+    Concurrent uploads of the same image share a single processing run.
+
+    :param file: The image file of the document to process
+    :param x_tenant_id: Tenant the request is scheduled under for fair sharing of LLM capacity
+    :param x_priority: Scheduling class: interactive, re_review or batch
+    :return: Extracted document data
+    """
+    return await _handle_process_request([file], x_tenant_id, x_priority)
+
+
+@router.post("/process-multi")
+async def process_multi_image_document_route(
+    files: List[UploadFile] = File(...),
+    x_tenant_id: str = Header(DEFAULT_TENANT),
+    x_priority: Priority = Header(Priority.INTERACTIVE),
+):
+    """
+    Process several images of one document (e.g. the front and back of a driver's license)
+    together: the document is classified once and all images are sent in one extraction
+    request, producing a single record with per-field source tracking.
+
+    :param files: The images of the document, in order (front first)
+    :param x_tenant_id: Tenant the request is scheduled under for fair sharing of LLM capacity
+    :param x_priority: Scheduling class: interactive, re_review or batch
+    :return: Extracted document data, with the image index each field was read from
+    """
+    if not 1 <= len(files) <= settings.max_images_per_document:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Between 1 and {settings.max_images_per_document} images are required",
+        )
+    return await _handle_process_request(files, x_tenant_id, x_priority)
 
 
 @router.get("/documents")
-async def get_documents():
+async def get_documents(page: int | None = None, per_page: int | None = None):
     """
     Get all extracted document data.
 
+    :param page: Optional 1-based page number (requires per_page)
+    :param per_page: Optional page size
     :return: List of extracted document data
     """
-    documents = ExtractedDocumentData.find()
-    return {
-        "data": [doc.to_dict() for doc in documents],
+    documents = ExtractedDocumentData.find_summaries(page=page, per_page=per_page)
+    return FastJSONResponse({
+        "data": documents,
         "message": "Documents retrieved successfully",
-    }
+    })
 
 
 @router.get("/documents/{document_id}")
@@ -153,10 +304,13 @@ async def get_document(document_id: str):
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    return {
-        "data": document.to_dict(),
+    document_dict = document.to_dict()
+    document_dict["metadata"] = document.load_metadata()
+
+    return FastJSONResponse({
+        "data": document_dict,
         "message": "Document retrieved successfully",
-    }
+    })
 
 
 @router.get("/documents-to-review")
@@ -166,17 +320,131 @@ async def get_documents_to_review():
 
     :return: List of extracted document data
     """
-    documents = ExtractedDocumentData.find(needs_manual_review=True)
-    documents_with_urls = []
+    documents = ExtractedDocumentData.find_summaries(needs_manual_review=True)
 
     for doc in documents:
-        doc_dict = doc.to_dict()
-        if doc_dict.get('document_image_s3_url'):
-            presigned_url = s3_service.generate_presigned_url(doc_dict['document_image_s3_url'])
-            doc_dict['viewable_url'] = presigned_url
-        documents_with_urls.append(doc_dict)
+        if doc.get('document_image_s3_url'):
+            presigned_url = s3_service.generate_presigned_url(doc['document_image_s3_url'])
+            doc['viewable_url'] = presigned_url
 
-    return {
-        "data": documents_with_urls,
+    return FastJSONResponse({
+        "data": documents,
         "message": "Documents retrieved successfully",
+    })
+
+
+def _changed_fields(doc: dict, update: dict) -> dict:
+    """The `$set` fields of an update whose value differs from the raw document's current value"""
+    changes = {}
+    for path, value in update.items():
+        current = doc
+        for part in path.split("."):
+            current = current.get(part) if isinstance(current, dict) else None
+        if current != value:
+            changes[path] = value
+    return changes
+
+
+@router.post("/documents/review")
+async def bulk_review_documents(request: BulkReviewRequest):
+    """
+    Complete manual review for many documents at once, applying approvals, rejections
+    and per-field corrections in a single bulk write.
+
+    :param request: The reviews to apply, one per document
+    :return: The fields changed on each document, and the IDs that were invalid or not found
+    """
+    if not request.reviews:
+        raise HTTPException(status_code=400, detail="No reviews provided")
+
+    reviewed_at = datetime.utcnow()
+    invalid_ids = [r.document_id for r in request.reviews if not ObjectId.is_valid(r.document_id)]
+    reviews = {
+        ObjectId(review.document_id): review
+        for review in request.reviews
+        if ObjectId.is_valid(review.document_id)
+    }
+
+    before = stats_service.fetch_for_stats(list(reviews))
+    documents = {doc["_id"]: doc for doc in before}
+    missing_ids = [str(document_id) for document_id in reviews if document_id not in documents]
+
+    updates = {}
+    for document_id, doc in documents.items():
+        review = reviews[document_id]
+        extracted_data = doc.get("extracted_data") or {}
+        unknown_fields = sorted(set(review.corrections) - set(extracted_data))
+        if unknown_fields:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown correction fields for document {document_id}: {', '.join(unknown_fields)}",
+            )
+        # A correction repeating an already confident value changes nothing
+        corrections = {
+            field: value
+            for field, value in review.corrections.items()
+            if (extracted_data[field] or {}).get("value") != value
+            or (extracted_data[field] or {}).get("confidence") != "high"
+        }
+        updates[document_id] = ExtractedDocumentData.build_review_update(
+            rejected=review.rejected,
+            corrections=corrections,
+            reviewed_at=reviewed_at,
+        )
+
+    modified_count = ExtractedDocumentData.bulk_update(updates)
+    stats_service.record_reviews(before, updates)
+
+    return FastJSONResponse({
+        "data": [
+            {"document_id": document_id, "changes": _changed_fields(documents[document_id], update)}
+            for document_id, update in updates.items()
+        ],
+        "invalid_document_ids": invalid_ids,
+        "missing_document_ids": missing_ids,
+        "modified_count": modified_count,
+        "message": "Documents reviewed successfully",
+    })
+
+
+@router.get("/models/stats")
+async def get_model_stats():
+    """
+    Get the rolling per-stage model stats used for model routing.
+
+    :return: Success rate, review rate, p95 latency and cost per accepted response per stage and model
+    """
+    return {
+        "data": model_router.snapshot(),
+        "message": "Model stats retrieved successfully",
     }
+
+
+@router.get("/scheduler/metrics")
+async def get_scheduler_metrics():
+    """
+    Get LLM scheduler queue metrics and in-flight image memory.
+
+    :return: In-flight calls, queue depths, estimated and average waits, admission counts,
+        and the image memory budget usage
+    """
+    return {
+        "data": {
+            **llm_scheduler.metrics(),
+            "image_memory_budget": image_memory_budget.metrics(),
+        },
+        "message": "Scheduler metrics retrieved successfully",
+    }
+
+
+@router.get("/stats")
+async def get_stats():
+    """
+    Get aggregated document statistics, maintained incrementally on save and review.
+
+    :return: Counts by document type and review status, and per-field unsure rates
+    """
+    return FastJSONResponse({
+        "data": stats_service.get_stats(),
+        "message": "Stats retrieved successfully",
+    })
@@ -0,0 +1,94 @@
+"""
+Measure the local PDF417 fast path on a directory of license images: decode latency,
+how often the barcode covers every LicenseData field, and the LLM latency that saves.
+
+LLM latency is replayed from an LLM cassette (see utils.llm_cassette) at the recorded
+latencies, so the benchmark runs offline.
+
+Usage:
+    python -m benchmarks.license_barcode_bench --images licenses/ --cassette licenses/recordings.jsonl.gz
+"""
+import argparse
+import asyncio
+import math
+import os
+import statistics
+import time
+from typing import List
+
+from services.document_processor import license_barcode
+from services.document_processor.license_extraction import LicenseData, _extract_with_llm
+from utils.image_utils import as_encoded_images
+from utils.llm_cassette import CassetteMode, LLMCassette
+from utils.memory_budget import peak_rss_bytes
+from utils.query_llm import set_transport
+
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+def _p95(values: List[float]) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+
+
+async def run(image_dir: str, cassette_path: str = None) -> None:
+    if not license_barcode.is_available():
+        print("Barcode decoding is unavailable: install zxing-cpp and Pillow.")
+        return
+
+    image_paths = [
+        os.path.join(image_dir, name)
+        for name in sorted(os.listdir(image_dir))
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+    ]
+    if not image_paths:
+        print(f"No images found in {image_dir}")
+        return
+    if cassette_path:
+        set_transport(LLMCassette(cassette_path, mode=CassetteMode.REPLAY))
+
+    decode_ms, llm_ms, saved_ms = [], [], []
+    complete = 0
+    # Warm the process pool so worker start-up isn't counted
+    await license_barcode.decode_license_barcode(image_paths[:1])
+
+    for image_path in image_paths:
+        start = time.perf_counter()
+        fields, _ = await license_barcode.decode_license_barcode([image_path])
+        decode_ms.append((time.perf_counter() - start) * 1000)
+        is_complete = fields.keys() >= LicenseData.model_fields.keys()
+        complete += is_complete
+
+        if cassette_path:
+            start = time.perf_counter()
+            try:
+                await _extract_with_llm(as_encoded_images(image_path))
+            except Exception as e:
+                print(f"Skipping LLM timing for {image_path}: {str(e)}")
+                continue
+            llm_ms.append((time.perf_counter() - start) * 1000)
+            if is_complete:
+                saved_ms.append(llm_ms[-1] - decode_ms[-1])
+
+    print(f"{len(image_paths)} images, {complete} fully decoded from the barcode")
+    print(f"  decode latency p50/p95:  {statistics.median(decode_ms):8.1f} / {_p95(decode_ms):8.1f} ms")
+    if llm_ms:
+        print(f"  LLM latency p50/p95:     {statistics.median(llm_ms):8.1f} / {_p95(llm_ms):8.1f} ms")
+    if saved_ms:
+        print(f"  saved per full decode:   {statistics.mean(saved_ms):8.1f} ms (mean)")
+    print(f"  peak RSS:                {peak_rss_bytes() / 1024 / 1024:8.1f} MB")
+
+    license_barcode.shutdown_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", required=True)
+    parser.add_argument("--cassette")
+    args = parser.parse_args()
+    asyncio.run(run(args.images, args.cassette))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Compare the hydrated to_dict + jsonable_encoder path with the raw dict + orjson path
+for a page of list-endpoint documents. Runs without a database connection.
+
+Usage:
+    python -m benchmarks.serialization_bench --documents 10000
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+
+from bson.objectid import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from models.extracted_document_data import ExtractedDocumentData, SUMMARY_FIELDS
+from utils.memory_budget import peak_rss_bytes
+from utils.serialization import dumps
+
+
+LICENSE_FIELDS = [
+    "first_name", "last_name", "birth_date", "expiration_date", "license_number",
+    "address", "state", "sex", "height", "eye_color", "rstr",
+]
+
+
+def make_raw_documents(count: int) -> list:
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": ObjectId(),
+            "created_at": now,
+            "updated_at": now,
+            "document_type": "american_drivers_license",
+            "extracted_data": {
+                field: {"visible": True, "value": f"{field}-{i}", "confidence": "high"}
+                for field in LICENSE_FIELDS
+            },
+            "document_image_s3_url": f"https://bucket.s3.us-east-1.amazonaws.com/documents/{i}.jpg",
+            "needs_manual_review": i % 7 == 0,
+            "manual_review_completed": False,
+            "metadata_summary": {"classified_as": "american_drivers_license", "unsure_fields": []},
+        }
+        for i in range(count)
+    ]
+
+
+def hydrated_path(raw_documents: list) -> bytes:
+    documents = [ExtractedDocumentData._from_son(dict(doc)) for doc in raw_documents]
+    content = jsonable_encoder({"data": [doc.to_dict() for doc in documents]})
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def raw_path(raw_documents: list) -> bytes:
+    documents = [{k: doc[k] for k in doc if k == "_id" or k in SUMMARY_FIELDS} for doc in raw_documents]
+    for doc in documents:
+        doc["id"] = doc.pop("_id")
+    return dumps({"data": documents})
+
+
+def timed(fn, raw_documents: list, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(raw_documents)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documents", type=int, default=10_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    raw_documents = make_raw_documents(args.documents)
+    hydrated = timed(hydrated_path, raw_documents, args.rounds)
+    raw = timed(raw_path, raw_documents, args.rounds)
+
+    print(f"{args.documents} documents, best of {args.rounds} rounds")
+    print(f"  hydrated + to_dict + jsonable_encoder: {hydrated * 1000:8.1f} ms")
+    print(f"  raw dicts + orjson:                    {raw * 1000:8.1f} ms")
+    print(f"  speedup:                               {hydrated / raw:8.1f}x")
+    print(f"  peak RSS:                              {peak_rss_bytes() / 1024 / 1024:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+from functools import lru_cache
+
+from redis.asyncio import Redis
+
+from config.settings import get_settings
+
+
+@lru_cache()
+def get_redis() -> Redis:
+    settings = get_settings()
+
+    if settings.redis_url:
+        return Redis.from_url(settings.redis_url)
+    return Redis(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        password=settings.redis_password,
+    )
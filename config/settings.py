@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
-from typing import Union, List
+from typing import Dict, Union, List
 from dotenv import load_dotenv
 import os
 
@@ -23,6 +23,89 @@ class Settings(BaseSettings):
     redis_password: str | None = None
     redis_url: str | None = None
 
+    # Uploads
+    max_upload_bytes: int = 15 * 1024 * 1024
+    upload_chunk_size: int = 1024 * 1024
+    max_images_per_document: int = 4
+
+    # Memory budget for in-flight images: requests reserve raw size times the overhead
+    # factor (encoded buffer, request body, response objects) and wait or get a 503 beyond it
+    image_memory_budget_bytes: int = 512 * 1024 * 1024
+    image_memory_budget_wait_seconds: float = 10.0
+    image_memory_overhead_factor: float = 3.0
+
+    # Local journal for document writes that failed and are retried in the background
+    write_journal_dir: str = "data/write_journal"
+    write_journal_max_attempts: int = 10
+    write_journal_interval_seconds: float = 5.0
+
+    # Single-flight coalescing of identical in-flight uploads. The leader renews its lock
+    # while it works (including any LLM queue wait), so the TTL only sets how long a
+    # crashed leader holds back the other workers
+    single_flight_use_redis: bool = True
+    single_flight_lock_ttl_seconds: int = 30
+
+    # Local PDF417 barcode decoding for US driver's licenses (needs zxing-cpp and Pillow)
+    license_barcode_enabled: bool = True
+    license_barcode_workers: int = 2
+    license_barcode_timeout_seconds: float = 2.0
+    # Images are downscaled to this many pixels on the long side before decoding
+    license_barcode_max_side: int = 2000
+
+    # Perceptual-hash near-duplicate index (needs Pillow). Uploads within phash_max_distance
+    # bits of a stored document are flagged for review.
+    phash_enabled: bool = True
+    phash_max_distance: int = 6
+    phash_refresh_interval_seconds: float = 30.0
+
+    # LLM model routing. Candidate chains are reordered per stage from rolling stats;
+    # extraction escalates when a field comes back unsure. Chains are listed weakest first,
+    # and escalation only ever moves to a stronger model than the one that was unsure.
+    llm_classification_models: List[str] = [
+        "accounts/fireworks/models/llama-v3p2-11b-vision-instruct",
+        "accounts/fireworks/models/llama-v3p2-90b-vision-instruct",
+    ]
+    llm_extraction_models: List[str] = [
+        "accounts/fireworks/models/llama-v3p2-11b-vision-instruct",
+        "accounts/fireworks/models/llama-v3p2-90b-vision-instruct",
+    ]
+    # USD per 1M tokens, used to order models that meet the SLOs
+    llm_model_costs: Dict[str, float] = {
+        "accounts/fireworks/models/llama-v3p2-11b-vision-instruct": 0.20,
+        "accounts/fireworks/models/llama-v3p2-90b-vision-instruct": 0.90,
+    }
+    llm_latency_slo_seconds: Dict[str, float] = {
+        "classification": 5.0,
+        "extraction": 15.0,
+    }
+    # Max average USD per accepted response, counting failed and escalated calls too
+    llm_cost_slo_usd: Dict[str, float] = {
+        "classification": 0.005,
+        "extraction": 0.01,
+    }
+    llm_min_success_rate: float = 0.9
+    llm_max_review_rate: float = 0.3
+    llm_router_window: int = 200
+    llm_router_min_samples: int = 20
+    llm_router_explore_rate: float = 0.05
+
+    # LLM scheduling: concurrent call limit, max estimated queue wait per priority class
+    # before requests are rejected with 429, and per-tenant fair-share weights
+    llm_max_concurrency: int = 16
+    llm_queue_slo_seconds: Dict[str, float] = {
+        "interactive": 10.0,
+        "re_review": 30.0,
+        "batch": 300.0,
+    }
+    llm_tenant_weights: Dict[str, float] = {}
+
+    # LLM record/replay cassette: "passthrough", "record" or "replay"
+    llm_cassette_mode: str = "passthrough"
+    llm_cassette_path: str = "cassettes/llm.jsonl.gz"
+    # Fixed replay latency; when unset, recorded latency times llm_cassette_latency_scale
+    llm_cassette_latency_seconds: float | None = None
+    llm_cassette_latency_scale: float = 1.0
+
     # s3
     document_images_s3_bucket_name: str = "fireworks-take-home-document-images"
     s3_region: str = "us-east-1"
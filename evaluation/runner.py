@@ -0,0 +1,235 @@
+"""
+Offline accuracy and latency evaluation of the document processing pipeline.
+
+The corpus is a directory of images, each with a sidecar label file of the same name:
+
+    corpus/license-01.png
+    corpus/license-01.json   {"document_type": "american_drivers_license",
+                              "fields": {"first_name": "JANE", "last_name": "DOE", ...}}
+
+LLM calls are replayed from the <corpus>/recordings.jsonl.gz cassette, so runs need no
+network. Pass --record once to fill in missing recordings from Fireworks, and
+--latency-scale to replay at (a multiple of) the recorded latencies.
+
+Usage:
+    python -m evaluation.runner run --corpus corpus/ --name baseline --out baseline.json
+    python -m evaluation.runner compare baseline.json candidate.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from typing import Dict, List, Optional
+
+from config.settings import get_settings
+from services.document_processor.processor import (
+    DocumentNotRecognizedError,
+    UnsupportedDocumentTypeError,
+    process_document,
+)
+from utils.llm_cassette import CassetteMode, LLMCassette
+from utils.memory_budget import peak_rss_bytes
+from utils.model_router import model_router
+from utils.query_llm import set_transport, track_usage
+
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".heic"}
+
+
+def _normalize(value: Optional[str]) -> str:
+    return " ".join((value or "").split()).casefold()
+
+
+def _percentile(values: List[float], percentile: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(percentile * len(ordered)) - 1)]
+
+
+def load_corpus(corpus_dir: str) -> List[dict]:
+    """Pair every image in the corpus directory with its label file"""
+    samples = []
+    for filename in sorted(os.listdir(corpus_dir)):
+        name, extension = os.path.splitext(filename)
+        if extension.lower() not in IMAGE_EXTENSIONS:
+            continue
+        label_path = os.path.join(corpus_dir, f"{name}.json")
+        if not os.path.exists(label_path):
+            print(f"Skipping {filename}: no label file")
+            continue
+        with open(label_path) as f:
+            samples.append(
+                {"name": name, "image_path": os.path.join(corpus_dir, filename), "label": json.load(f)}
+            )
+    return samples
+
+
+async def evaluate_sample(sample: dict, semaphore: asyncio.Semaphore) -> dict:
+    async with semaphore:
+        usage = track_usage()
+        label = sample["label"]
+        expected_fields: Dict[str, str] = label.get("fields", {})
+        result = {
+            "name": sample["name"],
+            "expected_type": label["document_type"],
+            "predicted_type": None,
+            "field_matches": {},
+            "needs_manual_review": None,
+            "error": None,
+        }
+
+        start = time.perf_counter()
+        try:
+            response = await process_document(sample["image_path"])
+            result["predicted_type"] = response.document_type.value
+            extracted = response.extracted_data.model_dump(mode="json") if response.extracted_data else {}
+            result["needs_manual_review"] = any(
+                field.get("confidence") == "unsure" for field in extracted.values()
+            )
+            for field, expected in expected_fields.items():
+                actual = extracted.get(field, {}).get("value")
+                result["field_matches"][field] = _normalize(actual) == _normalize(expected)
+        except (DocumentNotRecognizedError, UnsupportedDocumentTypeError) as e:
+            # Rejections are classifications too: a not_a_document sample should be rejected
+            if e.document_type is None:
+                result["error"] = str(e)
+            else:
+                result["predicted_type"] = e.document_type.value
+        except Exception as e:
+            result["error"] = str(e)
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        result["tokens"] = dict(usage)
+        result["correct_type"] = result["predicted_type"] == result["expected_type"]
+        return result
+
+
+def summarize(results: List[dict], name: str) -> dict:
+    settings = get_settings()
+    fields: Dict[str, Dict[str, int]] = {}
+    for result in results:
+        for field, matched in result["field_matches"].items():
+            key = f"{result['expected_type']}.{field}"
+            counts = fields.setdefault(key, {"matched": 0, "total": 0})
+            counts["matched"] += int(matched)
+            counts["total"] += 1
+    for counts in fields.values():
+        counts["accuracy"] = round(counts["matched"] / counts["total"], 4)
+
+    reviewed = [r["needs_manual_review"] for r in results if r["needs_manual_review"] is not None]
+    latencies = [r["latency_ms"] for r in results]
+    matched_fields = sum(c["matched"] for c in fields.values())
+    total_fields = sum(c["total"] for c in fields.values())
+    tokens: Dict[str, int] = {}
+    for result in results:
+        for key, value in result["tokens"].items():
+            tokens[key] = tokens.get(key, 0) + value
+
+    return {
+        "config": {
+            "name": name,
+            "classification_models": settings.llm_classification_models,
+            "extraction_models": settings.llm_extraction_models,
+        },
+        "summary": {
+            "documents": len(results),
+            "errors": sum(1 for r in results if r["error"]),
+            "classification_accuracy": round(
+                sum(r["correct_type"] for r in results) / len(results), 4
+            ) if results else None,
+            "field_exact_match": round(matched_fields / total_fields, 4) if total_fields else None,
+            "manual_review_rate": round(sum(reviewed) / len(reviewed), 4) if reviewed else None,
+            "latency_p50_ms": _percentile(latencies, 0.5),
+            "latency_p95_ms": _percentile(latencies, 0.95),
+            "tokens": tokens,
+            "peak_rss_mb": round(peak_rss_bytes() / 1024 / 1024, 1),
+        },
+        "fields": fields,
+        "documents": results,
+    }
+
+
+async def run(
+    corpus_dir: str,
+    name: str,
+    concurrency: int,
+    record: bool,
+    latency_scale: float = 0.0,
+) -> dict:
+    set_transport(
+        LLMCassette(
+            path=os.path.join(corpus_dir, "recordings.jsonl.gz"),
+            mode=CassetteMode.RECORD if record else CassetteMode.REPLAY,
+            latency_scale=latency_scale,
+        )
+    )
+    # Keep the configured model chains: exploration and stats-based reordering would call
+    # models the cassette never recorded and make runs differ from one another
+    model_router.adaptive = False
+    samples = load_corpus(corpus_dir)
+    semaphore = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(*(evaluate_sample(sample, semaphore) for sample in samples))
+    return summarize(list(results), name)
+
+
+def compare(baseline: dict, candidate: dict) -> List[str]:
+    """Render metric deltas between two reports, one line per metric"""
+    lines = [f"{'metric':<40} {baseline['config']['name']:>14} {candidate['config']['name']:>14} {'delta':>10}"]
+
+    def add_line(metric: str, before, after):
+        delta = f"{after - before:+.4f}" if before is not None and after is not None else "n/a"
+        lines.append(f"{metric:<40} {str(before):>14} {str(after):>14} {delta:>10}")
+
+    for metric, before in baseline["summary"].items():
+        if metric == "tokens":
+            continue
+        add_line(metric, before, candidate["summary"].get(metric))
+    for key in sorted(set(baseline["summary"]["tokens"]) | set(candidate["summary"]["tokens"])):
+        add_line(f"tokens.{key}", baseline["summary"]["tokens"].get(key), candidate["summary"]["tokens"].get(key))
+    for field in sorted(set(baseline["fields"]) | set(candidate["fields"])):
+        add_line(
+            f"field.{field}",
+            baseline["fields"].get(field, {}).get("accuracy"),
+            candidate["fields"].get(field, {}).get("accuracy"),
+        )
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Evaluate the pipeline over a labeled corpus")
+    run_parser.add_argument("--corpus", required=True)
+    run_parser.add_argument("--name", default="default")
+    run_parser.add_argument("--out", required=True)
+    run_parser.add_argument("--concurrency", type=int, default=4)
+    run_parser.add_argument("--record", action="store_true")
+    run_parser.add_argument("--latency-scale", type=float, default=0.0)
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two evaluation reports")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = asyncio.run(
+            run(args.corpus, args.name, args.concurrency, args.record, args.latency_scale)
+        )
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(json.dumps(report["summary"], indent=2, sort_keys=True))
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.candidate) as f:
+            candidate = json.load(f)
+        print("\n".join(compare(baseline, candidate)))
+
+
+if __name__ == "__main__":
+    main()
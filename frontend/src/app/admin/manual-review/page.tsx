@@ -30,32 +30,37 @@ interface ExtractedDocumentData {
   manual_review_completed: boolean;
 }
 
+interface DocumentReview {
+  document_id: string;
+  rejected: boolean;
+  corrections?: Record<string, string>;
+}
+
+interface BulkReviewResponse {
+  document_id: string;
+  changes: Record<string, any>;
+}
+
 export default function ManualReviewPage() {
   const [selectedDocument, setSelectedDocument] = useState<ExtractedDocumentData | null>(null);
   const { data, error, loading, refresh } = useFetch<ExtractedDocumentData[]>(`${process.env.NEXT_PUBLIC_BACKEND_URL}/documents-to-review`);
-  const updateApi = useApi<ExtractedDocumentData>('/api/documents');
-
-  const handleApprove = async (documentId: string) => {
-    await updateApi.execute('PUT', {
-      id: documentId,
-      manual_review_completed: true,
-      needs_manual_review: false
-    });
-    refresh();
-    setSelectedDocument(null);
-  };
+  const reviewApi = useApi<BulkReviewResponse>(`${process.env.NEXT_PUBLIC_BACKEND_URL}/documents/review`);
 
-  const handleReject = async (documentId: string) => {
-    await updateApi.execute('PUT', {
-      id: documentId,
-      manual_review_completed: true,
-      needs_manual_review: false,
-      rejected: true
-    });
+  const submitReviews = async (reviews: DocumentReview[]) => {
+    await reviewApi.execute('POST', { reviews });
     refresh();
     setSelectedDocument(null);
   };
 
+  const handleApprove = (documentId: string) =>
+    submitReviews([{ document_id: documentId, rejected: false }]);
+
+  const handleReject = (documentId: string) =>
+    submitReviews([{ document_id: documentId, rejected: true }]);
+
+  const handleApproveAll = (documents: ExtractedDocumentData[]) =>
+    submitReviews(documents.map((doc) => ({ document_id: doc.id, rejected: false })));
+
   if (loading) {
     return (
       <Box display="flex" justifyContent="center" alignItems="center" minHeight="80vh">
@@ -83,9 +88,20 @@ export default function ManualReviewPage() {
       <Grid container spacing={3}>
         <Grid item xs={12} md={selectedDocument ? 6 : 12}>
           <Paper sx={{ p: 2 }}>
-            <Typography variant="h6" gutterBottom>
-              Documents Pending Review ({documents.length})
-            </Typography>
+            <Stack direction="row" justifyContent="space-between" alignItems="center" sx={{ mb: 1 }}>
+              <Typography variant="h6">
+                Documents Pending Review ({documents.length})
+              </Typography>
+              <Button
+                variant="outlined"
+                color="success"
+                startIcon={<CheckCircle />}
+                disabled={documents.length === 0}
+                onClick={() => handleApproveAll(documents)}
+              >
+                Approve All
+              </Button>
+            </Stack>
             <Stack spacing={2}>
               {documents.map((doc) => (
                 <Card
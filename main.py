@@ -1,16 +1,34 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from api import router as api_router
+from api.routes import phash_index, write_journal
 from config.settings import settings
 from config.db import connect_db
+from services.document_processor import license_barcode
+from utils.llm_cassette import install_cassette_from_settings
+from utils.upload_utils import MULTIPART_OVERHEAD_BYTES, RequestSizeLimitMiddleware
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     connect_db()
+    install_cassette_from_settings()
+    journal_task = asyncio.create_task(
+        write_journal.run(interval=settings.write_journal_interval_seconds)
+    )
+    phash_task = None
+    if settings.phash_enabled and phash_index.enabled:
+        phash_task = asyncio.create_task(
+            phash_index.run_refresh(interval=settings.phash_refresh_interval_seconds)
+        )
     yield
+    journal_task.cancel()
+    if phash_task:
+        phash_task.cancel()
+    license_barcode.shutdown_pool()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -25,6 +43,16 @@ app.add_middleware(
 )
 
 
+max_image_request_bytes = settings.max_upload_bytes + MULTIPART_OVERHEAD_BYTES
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    limits={
+        "/api/v1/process": max_image_request_bytes,
+        "/api/v1/process-multi": max_image_request_bytes * settings.max_images_per_document,
+    },
+)
+
+
 app.include_router(api_router, prefix="/api")
 
 
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Optional, TypeVar, Union, List
+from typing import Any, Dict, Optional, TypeVar, Union, List
 from mongoengine import (
     Document,
     DateTimeField,
@@ -10,6 +10,7 @@ from mongoengine import (
 )
 from datetime import datetime
 from bson.objectid import ObjectId
+from pymongo import UpdateOne
 
 
 T = TypeVar("T", bound=Union[Document, DynamicDocument])
@@ -90,6 +91,29 @@ class BaseModel(Document):
             return cls._execute_query(cls.objects(**kwargs).skip(start).limit(per_page))
         return cls._execute_query(cls.objects(**kwargs))
 
+    @classmethod
+    def find_raw(
+        cls,
+        page: int = None,
+        per_page: int = None,
+        fields: List[str] = None,
+        exclude: List[str] = None,
+        **kwargs,
+    ) -> List[dict]:
+        """
+        Find documents as raw pymongo dicts, skipping MongoEngine hydration.
+        Meant for read-only queries whose results are serialized straight to JSON.
+        """
+        cls._check_objects_attribute()
+        queryset = cls.objects(**kwargs)
+        if fields:
+            queryset = queryset.only(*fields)
+        if exclude:
+            queryset = queryset.exclude(*exclude)
+        if page is not None and per_page is not None:
+            queryset = queryset.skip((page - 1) * per_page).limit(per_page)
+        return list(queryset.as_pymongo())
+
     @classmethod
     def find_by_id_and_update(cls, id: str, **kwargs) -> Optional[T]:
         """Find a document by ID and update it with the given values"""
@@ -99,6 +123,25 @@ class BaseModel(Document):
             return cls.find_by_id(str(id))
         return None
 
+    @classmethod
+    def bulk_update(cls, updates: Dict[ObjectId, Dict[str, Any]]) -> int:
+        """
+        Apply raw `$set` updates (keyed by document ID) in a single bulk_write round-trip.
+        Unlike find_by_id_and_update, the updated documents are not read back.
+
+        Returns the number of modified documents.
+        """
+        cls._check_objects_attribute()
+        if not updates:
+            return 0
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne({"_id": id}, {"$set": {**fields, "updated_at": now}})
+            for id, fields in updates.items()
+        ]
+        result = cls._get_collection().bulk_write(operations, ordered=False)
+        return result.modified_count
+
     @classmethod
     def find_by_id_and_delete(cls, id: str) -> Optional[T]:
         """Find a document by ID and delete it"""
@@ -0,0 +1,25 @@
+from mongoengine import *
+
+from models.base_model import BaseModel
+
+
+class DocumentArtifact(BaseModel):
+    """
+    Raw model responses and audit payloads for an ExtractedDocumentData record.
+    Stored in its own collection so list queries on the main collection stay small;
+    only loaded on demand when a single document is requested.
+    """
+
+    document_id = ObjectIdField(required=True)
+    classification = DictField()
+    extraction = DictField()
+
+    # One artifact per document, so the backfill can upsert by document_id. Named apart from
+    # the old non-unique document_id_1 index, which scripts/backfill_document_artifacts.py drops
+    meta = {"indexes": [{"fields": ["document_id"], "unique": True, "name": "document_id_unique"}]}
+
+    def to_payload(self):
+        return {
+            "classification": self.classification,
+            "extracted_data": self.extraction,
+        }
@@ -0,0 +1,19 @@
+from mongoengine import *
+
+from models.base_model import BaseModel
+
+
+class DocumentStats(BaseModel):
+    """
+    Incrementally maintained counters over ExtractedDocumentData, updated with atomic
+    `$inc` on save and review so the dashboard never has to scan the collection.
+    """
+
+    id = StringField(primary_key=True)
+    total = IntField(default=0)
+    # {document_type: count}
+    by_type = DictField()
+    # {review_status: count}, see services.stats_service.review_status
+    review_status = DictField()
+    # {document_type: {field: {"total": count, "unsure": count}}}
+    field_confidence = DictField()
@@ -3,23 +3,112 @@ from datetime import datetime, timedelta
 from mongoengine import *
 
 from models.base_model import BaseModel
+from models.document_artifact import DocumentArtifact
+
+
+SUMMARY_FIELDS = [
+    "id",
+    "document_type",
+    "extracted_data",
+    "document_image_s3_url",
+    "additional_image_s3_urls",
+    "field_sources",
+    "needs_manual_review",
+    "manual_review_completed",
+    "rejected",
+    "manual_corrections",
+    "metadata_summary",
+    "near_duplicate_of",
+]
 
 
 class ExtractedDocumentData(BaseModel):
     document_type = StringField(required=True)
     extracted_data = DictField(required=True)
     document_image_s3_url = StringField()
+    # Further images of the same document (e.g. the back of a license), in upload order
+    additional_image_s3_urls = ListField(StringField())
+    # Field name -> 1-based index of the image the field was read from, for multi-image documents
+    field_sources = DictField()
     needs_manual_review = BooleanField(default=False)
     manual_review_completed = BooleanField(default=False)
+    rejected = BooleanField(default=False)
+    # Reviewer corrections keyed by extracted field name: {"value": ..., "corrected_at": ...}
+    manual_corrections = DictField()
+    # Compact summary of the processing metadata, the full payload lives in DocumentArtifact
+    metadata_summary = DictField()
+    artifact_id = ObjectIdField()
+    # Hex dHash of the first image, loaded into services/phash_index.py at startup
+    perceptual_hash = StringField()
+    # Earlier documents whose first image is perceptually near-identical to this one
+    near_duplicate_of = ListField(ObjectIdField())
+    # Legacy inline metadata, moved into DocumentArtifact by scripts/backfill_document_artifacts.py
     metadata = DictField()
 
+    @staticmethod
+    def build_metadata_summary(metadata: dict) -> dict:
+        """Reduce a full processing metadata payload to the fields needed for listing"""
+        classification = metadata.get("classification") or {}
+        extraction = metadata.get("extracted_data") or {}
+        fields = next(
+            (v for k, v in extraction.items() if k.endswith("_data") and isinstance(v, dict)),
+            {},
+        )
+        return {
+            "classified_as": classification.get("document_type"),
+            "has_extraction": bool(extraction),
+            "unsure_fields": sorted(
+                name
+                for name, field in fields.items()
+                if isinstance(field, dict) and field.get("confidence") == "unsure"
+            ),
+        }
+
+    @staticmethod
+    def build_review_update(rejected: bool, corrections: dict, reviewed_at: datetime) -> dict:
+        """Build the `$set` fields that complete a manual review with optional field corrections"""
+        update = {
+            "manual_review_completed": True,
+            "needs_manual_review": False,
+            "rejected": rejected,
+        }
+        for field, value in corrections.items():
+            update[f"extracted_data.{field}.value"] = value
+            update[f"extracted_data.{field}.confidence"] = "high"
+            update[f"manual_corrections.{field}"] = {"value": value, "corrected_at": reviewed_at}
+        return update
+
+    @classmethod
+    def find_summaries(cls, page: int = None, per_page: int = None, **kwargs):
+        """
+        Find documents as raw dicts with the same fields as to_dict (`id` instead of `_id`),
+        skipping hydration and never loading the legacy inline metadata blob
+        """
+        documents = cls.find_raw(page=page, per_page=per_page, fields=SUMMARY_FIELDS, **kwargs)
+        for doc in documents:
+            doc["id"] = doc.pop("_id")
+        return documents
+
+    def load_metadata(self) -> dict:
+        """Load the full processing metadata from the artifact collection"""
+        if self.artifact_id:
+            artifact = DocumentArtifact.find_by_id(self.artifact_id)
+            if artifact:
+                return artifact.to_payload()
+        return self.metadata or {}
+
     def to_dict(self):
         return {
             "id": str(self.id),
             "document_type": self.document_type,
             "extracted_data": self.extracted_data,
             "document_image_s3_url": self.document_image_s3_url,
+            "additional_image_s3_urls": self.additional_image_s3_urls,
+            "field_sources": self.field_sources,
             "needs_manual_review": self.needs_manual_review,
             "manual_review_completed": self.manual_review_completed,
-            "metadata": self.metadata,
+            "rejected": self.rejected,
+            "manual_corrections": self.manual_corrections,
+            "metadata_summary": self.metadata_summary,
+            "near_duplicate_of": [str(id) for id in self.near_duplicate_of],
         }
@@ -0,0 +1,153 @@
+"""
+Move inline `metadata` blobs from ExtractedDocumentData into the DocumentArtifact
+collection, leaving a compact `metadata_summary` and an `artifact_id` reference behind.
+
+Usage:
+    python -m scripts.backfill_document_artifacts --batch-size 500
+    python -m scripts.backfill_document_artifacts --dry-run
+"""
+import argparse
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from mongoengine.connection import get_db
+
+from config.db import connect_db
+from models.document_artifact import DocumentArtifact
+from models.extracted_document_data import ExtractedDocumentData
+
+
+PENDING_FILTER = {
+    "metadata": {"$exists": True, "$ne": {}},
+    "artifact_id": {"$exists": False},
+}
+
+
+def ensure_unique_artifact_index(dry_run: bool = False) -> int:
+    """
+    Remove duplicate artifacts left by interrupted runs of earlier versions of this script,
+    keeping the one each document references (or the oldest), then replace the non-unique
+    document_id index with the unique one the upserts rely on. Returns the number removed.
+    """
+    # Raw collection: DocumentArtifact._get_collection() would try to build the unique
+    # index before the duplicates blocking it are gone
+    artifacts = get_db()[DocumentArtifact._get_collection_name()]
+    removed = 0
+    duplicates = artifacts.aggregate([
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": "$document_id", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ])
+    for group in duplicates:
+        doc = ExtractedDocumentData._get_collection().find_one({"_id": group["_id"]}, {"artifact_id": 1})
+        keep = doc.get("artifact_id") if doc and doc.get("artifact_id") in group["ids"] else group["ids"][0]
+        extra = [artifact_id for artifact_id in group["ids"] if artifact_id != keep]
+        if not dry_run:
+            artifacts.delete_many({"_id": {"$in": extra}})
+        removed += len(extra)
+
+    if not dry_run:
+        DocumentArtifact.ensure_indexes()
+        if "document_id_1" in artifacts.index_information():
+            artifacts.drop_index("document_id_1")
+    return removed
+
+
+def backfill_batch(documents: list, dry_run: bool = False) -> int:
+    """
+    Create artifacts for a batch of raw documents and point the documents at them.
+
+    Artifacts are upserted by document_id, so re-running after a crash between the two
+    writes reuses the artifacts already created instead of duplicating them.
+    """
+    if dry_run:
+        return len(documents)
+
+    now = datetime.utcnow()
+    artifacts = DocumentArtifact._get_collection()
+    artifacts.bulk_write(
+        [
+            UpdateOne(
+                {"document_id": doc["_id"]},
+                {
+                    "$setOnInsert": {
+                        "classification": (doc.get("metadata") or {}).get("classification") or {},
+                        "extraction": (doc.get("metadata") or {}).get("extracted_data") or {},
+                        "created_at": doc.get("created_at", now),
+                        "updated_at": now,
+                    }
+                },
+                upsert=True,
+            )
+            for doc in documents
+        ],
+        ordered=False,
+    )
+    artifact_ids = {
+        artifact["document_id"]: artifact["_id"]
+        for artifact in artifacts.find(
+            {"document_id": {"$in": [doc["_id"] for doc in documents]}}, {"document_id": 1}
+        )
+    }
+
+    operations = [
+        UpdateOne(
+            {"_id": doc["_id"], "artifact_id": {"$exists": False}},
+            {
+                "$set": {
+                    "artifact_id": artifact_ids[doc["_id"]],
+                    "metadata_summary": ExtractedDocumentData.build_metadata_summary(
+                        doc.get("metadata") or {}
+                    ),
+                },
+                "$unset": {"metadata": ""},
+            },
+        )
+        for doc in documents
+    ]
+    result = ExtractedDocumentData._get_collection().bulk_write(operations, ordered=False)
+    return result.modified_count
+
+
+def backfill(batch_size: int = 500, dry_run: bool = False) -> int:
+    collection = ExtractedDocumentData._get_collection()
+    last_id = None
+    total = 0
+
+    while True:
+        query = dict(PENDING_FILTER)
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+
+        documents = list(
+            collection.find(query, {"metadata": 1, "created_at": 1})
+            .sort("_id", 1)
+            .limit(batch_size)
+        )
+        if not documents:
+            break
+
+        total += backfill_batch(documents, dry_run=dry_run)
+        last_id = documents[-1]["_id"]
+        print(f"Backfilled {total} documents (last id: {last_id})...")
+
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    connect_db()
+    removed = ensure_unique_artifact_index(dry_run=args.dry_run)
+    if removed:
+        print(f"{'Would remove' if args.dry_run else 'Removed'} {removed} duplicate artifacts.")
+    total = backfill(batch_size=args.batch_size, dry_run=args.dry_run)
+    print(f"{'Would backfill' if args.dry_run else 'Backfilled'} {total} documents.")
+
+
+if __name__ == "__main__":
+    main()
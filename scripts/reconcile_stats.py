@@ -0,0 +1,24 @@
+"""
+Recompute the document stats counters from the ExtractedDocumentData collection.
+
+Usage:
+    python -m scripts.reconcile_stats --batch-size 1000
+"""
+import argparse
+
+from config.db import connect_db
+from services import stats_service
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    connect_db()
+    stats = stats_service.reconcile(batch_size=args.batch_size)
+    print(f"Reconciled stats for {stats.get('total', 0)} documents.")
+
+
+if __name__ == "__main__":
+    main()
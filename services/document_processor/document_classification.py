@@ -1,7 +1,8 @@
 from pydantic import BaseModel
 from enum import Enum
-from utils.image_utils import encode_image
+from utils.image_utils import ImageInput, as_encoded_images, build_image_content
 from utils.query_llm import query_llm_with_fallbacks
+from config.settings import settings
 
 
 class DocumentType(Enum):
@@ -19,14 +20,19 @@ class DocumentClassificationResponse(BaseModel):
     document_type: DocumentType
 
 
-async def identify_document(image_path: str) -> DocumentClassificationResponse:
-    base64_image = encode_image(image_path)
+async def identify_document(image_path: ImageInput) -> DocumentClassificationResponse:
+    """Classify a document from one image, or from several images of the same document at once"""
+    images = as_encoded_images(image_path)
+    if len(images) == 1:
+        instruction = "Classify the following image of a document."
+    else:
+        instruction = (
+            "The following images show the sides or pages of a single document. Classify the document."
+        )
 
     response = await query_llm_with_fallbacks(
-        models=[
-            "accounts/fireworks/models/llama-v3p2-11b-vision-instruct",
-            "accounts/fireworks/models/llama-v3p2-90b-vision-instruct",
-        ],
+        models=settings.llm_classification_models,
+        stage="classification",
         response_schema=DocumentClassificationResponse,
         temperature=0.0,
         max_tokens=1000,
@@ -41,13 +47,10 @@ async def identify_document(image_path: str) -> DocumentClassificationResponse:
             {
                 "role": "user",
                 "content": [
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
-                    },
+                    *build_image_content(images),
                     {
                         "type": "text",
-                        "text": "Classify the following image of a document.",
+                        "text": instruction,
                     },
                 ],
             },
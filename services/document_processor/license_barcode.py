@@ -0,0 +1,229 @@
+"""
+CPU-only fast path for US driver's licenses: decode the AAMVA PDF417 barcode on the
+back of the license and map its data elements onto LicenseData fields.
+
+Decoding needs the optional zxing-cpp and Pillow packages; without them the fast path
+is disabled and extraction falls back to the LLM for every field.
+"""
+import asyncio
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import settings
+
+try:
+    import zxingcpp
+    from PIL import Image
+except ImportError:
+    zxingcpp = None
+    Image = None
+
+
+SEX_CODES = {"1": "M", "2": "F", "9": "X"}
+
+# Data element IDs per LicenseData field, newer AAMVA versions first
+FIELD_ELEMENTS = {
+    "first_name": ["DAC", "DCT"],
+    "last_name": ["DCS", "DAB"],
+    "birth_date": ["DBB"],
+    "expiration_date": ["DBA"],
+    "license_number": ["DAQ"],
+    "state": ["DAJ"],
+    "sex": ["DBC"],
+    "height": ["DAU"],
+    "eye_color": ["DAY"],
+    "rstr": ["DCB"],
+}
+
+ELEMENT_PATTERN = re.compile(r"^(?:DL|ID)?(D[A-Z]{2})(.*)$")
+# The header ("ANSI " + IIN, versions and subfile directory entries like "DL00410278")
+# shares a line with the first data element, which starts with the subfile type "DL"/"ID"
+HEADER_PATTERN = re.compile(r"(?:ANSI |AAMVA)[0-9A-Z ]*?(?=(?:DL|ID)D[A-Z]{2})")
+
+_pool: Optional[ProcessPoolExecutor] = None
+# Decodes submitted to the pool and not yet finished, including ones whose request already
+# timed out: a timeout only abandons the asyncio wrapper, the worker keeps decoding
+_in_flight = 0
+
+
+def is_available() -> bool:
+    return zxingcpp is not None and settings.license_barcode_enabled
+
+
+def decode_pdf417(image_path: str, max_side: Optional[int] = None) -> Optional[str]:
+    """
+    Return the raw text of the first AAMVA PDF417 barcode in an image, if any.
+
+    Images are first downscaled to at most max_side pixels on the long side: decode time
+    grows with pixel count, and a license barcode still has enough resolution at ~2000px.
+    Barcodes photographed small in a large frame may be lost, which falls back to the LLM.
+    """
+    if zxingcpp is None:
+        return None
+    try:
+        with Image.open(image_path) as image:
+            if max_side:
+                # JPEGs are scaled during decoding, which is much cheaper than resizing after
+                image.draft("L", (max_side, max_side))
+                image = image.convert("L")
+                image.thumbnail((max_side, max_side))
+            results = zxingcpp.read_barcodes(image, formats=zxingcpp.BarcodeFormat.PDF417)
+    except Exception:
+        # Unreadable or unsupported image format (e.g. HEIC without a plugin)
+        return None
+    for result in results:
+        if "ANSI " in result.text or "AAMVA" in result.text:
+            return result.text
+    return None
+
+
+def parse_elements(raw: str) -> Dict[str, str]:
+    """Split AAMVA barcode text into {element_id: value}, keeping the first occurrence"""
+    elements: Dict[str, str] = {}
+    for line in re.split(r"[\n\r\x1e]", raw):
+        line = HEADER_PATTERN.sub("", line.strip(), count=1)
+        match = ELEMENT_PATTERN.match(line)
+        if match and match.group(2).strip():
+            elements.setdefault(match.group(1), match.group(2).strip())
+    return elements
+
+
+def _format_date(value: str) -> Optional[str]:
+    """AAMVA dates are MMDDCCYY in the US and CCYYMMDD in Canada; normalize to MM/DD/YYYY"""
+    digits = value[:8]
+    if len(digits) != 8 or not digits.isdigit():
+        return None
+    if int(digits[:2]) > 12:
+        year, month, day = digits[:4], digits[4:6], digits[6:8]
+    else:
+        month, day, year = digits[:2], digits[2:4], digits[4:8]
+    return f"{month}/{day}/{year}"
+
+
+def _format_height(value: str) -> Optional[str]:
+    match = re.match(r"^(\d+)\s*(in|cm)?", value.strip().lower())
+    if not match:
+        return None
+    number = int(match.group(1))
+    if match.group(2) == "cm":
+        return f"{number} cm"
+    return f"{number // 12}'{number % 12:02d}\""
+
+
+def _format_zip(value: str) -> str:
+    digits = value.replace("-", "").strip()
+    if len(digits) == 9 and digits[5:] != "0000":
+        return f"{digits[:5]}-{digits[5:]}"
+    return digits[:5]
+
+
+def _format_address(elements: Dict[str, str]) -> Optional[str]:
+    street = " ".join(elements[e] for e in ("DAG", "DAH") if elements.get(e))
+    city, state, zip_code = elements.get("DAI"), elements.get("DAJ"), elements.get("DAK")
+    if not (street and city and state):
+        return None
+    return f"{street}, {city}, {state} {_format_zip(zip_code) if zip_code else ''}".strip()
+
+
+def parse_aamva(raw: str) -> Dict[str, str]:
+    """
+    Map AAMVA barcode text onto LicenseData field values, formatted like the LLM
+    extraction. Fields missing from the barcode are left out.
+    """
+    elements = parse_elements(raw)
+    fields: Dict[str, str] = {}
+
+    for field, element_ids in FIELD_ELEMENTS.items():
+        value = next((elements[e] for e in element_ids if elements.get(e)), None)
+        if value is None:
+            continue
+        if field in ("birth_date", "expiration_date"):
+            value = _format_date(value)
+        elif field == "sex":
+            value = SEX_CODES.get(value[:1], value)
+        elif field == "height":
+            value = _format_height(value)
+        if value:
+            fields[field] = value
+
+    address = _format_address(elements)
+    if address:
+        fields["address"] = address
+    return fields
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.license_barcode_workers)
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _call_soon(loop: asyncio.AbstractEventLoop, callback, *args) -> None:
+    try:
+        loop.call_soon_threadsafe(callback, *args)
+    except RuntimeError:
+        # Event loop already closed at shutdown
+        pass
+
+
+async def decode_license_barcode(image_paths: List[str]) -> Tuple[Dict[str, str], Optional[int]]:
+    """
+    Decode the license barcode from any of the images in a worker process.
+
+    Returns:
+        (fields, image_number): the decoded LicenseData field values and the 1-based index
+        of the image they came from, or ({}, None) if no barcode could be decoded in time
+    """
+    global _in_flight
+    if not is_available():
+        return {}, None
+
+    # Never queue behind busy workers: a backlog of slow decodes would make every later
+    # license time out. Without free workers the barcode is skipped and the LLM reads
+    # every field; with fewer free workers than images, the last images (the back of the
+    # license, where the barcode is) go first.
+    free_workers = settings.license_barcode_workers - _in_flight
+    if free_workers <= 0:
+        print("License barcode workers busy. Falling back to LLM extraction...")
+        return {}, None
+    candidates = list(enumerate(image_paths, start=1))[-free_workers:]
+
+    def release(_) -> None:
+        global _in_flight
+        _in_flight -= 1
+
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    futures = []
+    for _, path in candidates:
+        future = pool.submit(decode_pdf417, path, settings.license_barcode_max_side)
+        _in_flight += 1
+        # Worker threads finish the pool future, the counter lives on the event loop
+        future.add_done_callback(lambda f: _call_soon(loop, release, f))
+        futures.append(asyncio.wrap_future(future))
+    try:
+        raw_results = await asyncio.wait_for(
+            asyncio.gather(*futures),
+            timeout=settings.license_barcode_timeout_seconds,
+        )
+    except asyncio.TimeoutError:
+        print("License barcode decode timed out. Falling back to LLM extraction...")
+        return {}, None
+
+    # Prefer the image with the most complete barcode data
+    best: Tuple[Dict[str, str], Optional[int]] = ({}, None)
+    for (index, _), raw in zip(candidates, raw_results):
+        if raw:
+            fields = parse_aamva(raw)
+            if len(fields) > len(best[0]):
+                best = (fields, index)
+    return best
@@ -1,8 +1,17 @@
 from pydantic import BaseModel
 from enum import Enum
-
-from utils.image_utils import encode_image
+from typing import Collection, Dict, List
+
+from utils.image_utils import (
+    MULTI_IMAGE_INSTRUCTIONS,
+    EncodedImage,
+    ImageInput,
+    as_encoded_images,
+    build_image_content,
+)
 from utils.query_llm import query_llm_with_fallbacks
+from services.document_processor.license_barcode import decode_license_barcode
+from config.settings import settings
 
 
 class Confidence(Enum):
@@ -35,21 +44,12 @@ class LicenseDataResponse(BaseModel):
     license_data: LicenseData
 
 
-async def extract_license_data(image_path: str) -> LicenseDataResponse:
-    base64_image = encode_image(image_path)
+class MultiImageLicenseDataResponse(LicenseDataResponse):
+    # Field name -> 1-based index of the image the field was read from
+    field_sources: Dict[str, int]
 
-    response = await query_llm_with_fallbacks(
-        models=[
-            "accounts/fireworks/models/llama-v3p2-90b-vision-instruct",
-            "accounts/fireworks/models/llama-v3p2-11b-vision-instruct",
-        ],
-        response_schema=LicenseDataResponse,
-        temperature=0.0,
-        max_tokens=1000,
-        messages=[
-            {
-                "role": "system",
-                "content": """You are a precise document scanner specialized in extracting information from driver's 
+
+LICENSE_SYSTEM_PROMPT = """You are a precise document scanner specialized in extracting information from driver's 
                             licenses. 
                             For each field, you must:
                             1. Determine if the field is visible or not.
@@ -70,15 +70,40 @@ async def extract_license_data(image_path: str) -> LicenseDataResponse:
                             
                             Carefully examine the image and analyze all relevant fields and provide a short 1 sentence
                             analysis of the image before extracting the data. 
-                            """,
+                            """
+
+
+def _count_unsure_fields(response: LicenseDataResponse, ignore: Collection[str] = ()) -> int:
+    return sum(
+        1
+        for name, field in response.license_data
+        if name not in ignore and field.confidence == Confidence.UNSURE
+    )
+
+
+async def _extract_with_llm(
+    images: List[EncodedImage],
+    barcode_fields: Collection[str] = (),
+) -> LicenseDataResponse:
+    multi_image = len(images) > 1
+
+    response = await query_llm_with_fallbacks(
+        models=settings.llm_extraction_models,
+        stage="extraction",
+        # Fields covered by the barcode don't need a bigger model
+        count_issues=lambda r: _count_unsure_fields(r, ignore=barcode_fields),
+        response_schema=MultiImageLicenseDataResponse if multi_image else LicenseDataResponse,
+        temperature=0.0,
+        max_tokens=1000,
+        messages=[
+            {
+                "role": "system",
+                "content": LICENSE_SYSTEM_PROMPT + (MULTI_IMAGE_INSTRUCTIONS if multi_image else ""),
             },
             {
                 "role": "user",
                 "content": [
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
-                    },
+                    *build_image_content(images),
                     {
                         "type": "text",
                         "text": "Extract the license information and mark your confidence for each field.",
@@ -91,6 +116,50 @@ async def extract_license_data(image_path: str) -> LicenseDataResponse:
     return response
 
 
+async def extract_license_data(image_path: ImageInput) -> LicenseDataResponse:
+    """
+    Extract license fields from one image, or from several images of the same license
+    (e.g. front and back) in a single request with per-field source tracking.
+
+    The PDF417 barcode is decoded locally first. Barcode fields are treated as high
+    confidence; the LLM is only queried when the barcode is missing fields, and its
+    values for barcode fields are only used as a cross-check.
+    """
+    images = as_encoded_images(image_path)
+    multi_image = len(images) > 1
+    barcode_fields, barcode_image = await decode_license_barcode([image.path for image in images])
+
+    if barcode_fields.keys() >= LicenseData.model_fields.keys():
+        license_data = LicenseData(**{
+            field: FieldExtraction(visible=True, value=value, confidence=Confidence.HIGH)
+            for field, value in barcode_fields.items()
+        })
+        image_analysis = "All fields were decoded from the license's PDF417 barcode."
+        if multi_image:
+            return MultiImageLicenseDataResponse(
+                image_analysis=image_analysis,
+                license_data=license_data,
+                field_sources={field: barcode_image for field in barcode_fields},
+            )
+        return LicenseDataResponse(image_analysis=image_analysis, license_data=license_data)
+
+    response = await _extract_with_llm(images, barcode_fields=barcode_fields.keys())
+
+    for field, value in barcode_fields.items():
+        llm_field = getattr(response.license_data, field)
+        if llm_field.visible and " ".join(llm_field.value.split()).casefold() != value.casefold():
+            print(f"License barcode/LLM mismatch on {field}: barcode={value!r} llm={llm_field.value!r}")
+        setattr(
+            response.license_data,
+            field,
+            FieldExtraction(visible=True, value=value, confidence=Confidence.HIGH),
+        )
+        if isinstance(response, MultiImageLicenseDataResponse):
+            response.field_sources[field] = barcode_image
+
+    return response
+
+
 async def main():
     data = await extract_license_data("../../test_images/test-license.png")
     print(type(data))
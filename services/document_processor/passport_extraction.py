@@ -1,7 +1,15 @@
 from pydantic import BaseModel
 from enum import Enum
-from utils.image_utils import encode_image
+from typing import Dict
+
+from utils.image_utils import (
+    MULTI_IMAGE_INSTRUCTIONS,
+    ImageInput,
+    as_encoded_images,
+    build_image_content,
+)
 from utils.query_llm import query_llm_with_fallbacks
+from config.settings import settings
 
 
 class Confidence(Enum):
@@ -34,21 +42,12 @@ class PassportDataResponse(BaseModel):
     passport_data: PassportData
 
 
-async def extract_passport_data(image_path: str) -> PassportDataResponse:
-    base64_image = encode_image(image_path)
+class MultiImagePassportDataResponse(PassportDataResponse):
+    # Field name -> 1-based index of the image the field was read from
+    field_sources: Dict[str, int]
 
-    response = await query_llm_with_fallbacks(
-        models=[
-            "accounts/fireworks/models/llama-v3p2-90b-vision-instruct",
-            "accounts/fireworks/models/llama-v3p2-11b-vision-instruct",
-        ],
-        response_schema=PassportDataResponse,
-        temperature=0.0,
-        max_tokens=1000,
-        messages=[
-            {
-                "role": "system",
-                "content": """You are a precise document scanner specialized in extracting information from passports. 
+
+PASSPORT_SYSTEM_PROMPT = """You are a precise document scanner specialized in extracting information from passports. 
                             For each field, you must:
                             1. Determine if the field is visible or not.
                             2. Extract the value of the field.
@@ -70,15 +69,46 @@ async def extract_passport_data(image_path: str) -> PassportDataResponse:
                             
                             Carefully examine the image and analyze all relevant fields and provide a short 1 sentence
                             analysis of the image before extracting the data. 
-                            """,
+                            """
+
+FOREIGN_PASSPORT_SYSTEM_PROMPT = PASSPORT_SYSTEM_PROMPT + """
+                            The passport may be issued by any country:
+                            - Use the Latin-script spelling printed on the data page (or in the machine readable zone)
+                              for names, places and the issuing authority
+                            - If a field label is not in English, match it by position and meaning on the data page
+                            - Give issuing_country and nationality as printed, falling back to the 3-letter code in the
+                              machine readable zone
+                            """
+
+
+def _count_unsure_fields(response: PassportDataResponse) -> int:
+    return sum(
+        1 for _, field in response.passport_data if field.confidence == Confidence.UNSURE
+    )
+
+
+async def _extract(image_path: ImageInput, system_prompt: str) -> PassportDataResponse:
+    images = as_encoded_images(image_path)
+    multi_image = len(images) > 1
+    if multi_image:
+        system_prompt += MULTI_IMAGE_INSTRUCTIONS
+
+    response = await query_llm_with_fallbacks(
+        models=settings.llm_extraction_models,
+        stage="extraction",
+        count_issues=_count_unsure_fields,
+        response_schema=MultiImagePassportDataResponse if multi_image else PassportDataResponse,
+        temperature=0.0,
+        max_tokens=1000,
+        messages=[
+            {
+                "role": "system",
+                "content": system_prompt,
             },
             {
                 "role": "user",
                 "content": [
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
-                    },
+                    *build_image_content(images),
                     {
                         "type": "text",
                         "text": "Extract the passport information and mark your confidence for each field.",
@@ -91,6 +121,15 @@ async def extract_passport_data(image_path: str) -> PassportDataResponse:
     return response
 
 
+async def extract_passport_data(image_path: ImageInput) -> PassportDataResponse:
+    return await _extract(image_path, PASSPORT_SYSTEM_PROMPT)
+
+
+async def extract_foreign_passport_data(image_path: ImageInput) -> PassportDataResponse:
+    """Extract a non-US passport into the same PassportData schema as US passports"""
+    return await _extract(image_path, FOREIGN_PASSPORT_SYSTEM_PROMPT)
+
+
 async def main():
     data = await extract_passport_data("../../test_images/test-passport.png")
     print(type(data))
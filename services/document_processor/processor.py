@@ -1,56 +1,60 @@
 import asyncio
-from pydantic import BaseModel
-from typing import Union
+from pydantic import BaseModel, SerializeAsAny
+from typing import Dict, List, Optional, Union
 
 from services.document_processor.document_classification import (
     DocumentClassificationResponse,
     identify_document,
     DocumentType,
 )
-from services.document_processor.passport_extraction import (
-    PassportDataResponse,
-    extract_passport_data,
-    PassportData,
-)
-from services.document_processor.license_extraction import (
-    LicenseDataResponse,
-    extract_license_data,
-    LicenseData,
-)
+from services.document_processor.registry import get_extractor
+from utils.image_utils import as_encoded_images, clean_field_sources
 
 
 class Metadata(BaseModel):
     classification: DocumentClassificationResponse
-    extracted_data: Union[PassportDataResponse, LicenseDataResponse, None] = None
+    # Extractor responses (e.g. PassportDataResponse) are loaded lazily via the registry
+    extracted_data: Optional[SerializeAsAny[BaseModel]] = None
 
 
 class DocumentProcessingResponse(BaseModel):
     document_type: DocumentType
-    extracted_data: Union[PassportData, LicenseData, None] = None
+    extracted_data: Optional[SerializeAsAny[BaseModel]] = None
+    # For multi-image documents: field name -> 1-based index of the image it was read from
+    field_sources: Optional[Dict[str, int]] = None
     metadata: Metadata = None
 
 
 class UnsupportedDocumentTypeError(Exception):
-    pass
+    def __init__(self, message: str, document_type: Optional[DocumentType] = None):
+        self.document_type = document_type
+        super().__init__(message)
 
 
 class DocumentNotRecognizedError(Exception):
-    pass
+    def __init__(self, message: str, document_type: Optional[DocumentType] = None):
+        self.document_type = document_type
+        super().__init__(message)
 
 
-async def process_document(image_path: str) -> DocumentProcessingResponse:
+async def process_document(image_path: Union[str, List[str]]) -> DocumentProcessingResponse:
     """
     Process an ID document image by first identifying the document type and then extracting
     relevant information based on the document type.
 
+    Several images of the same document (e.g. the front and back of a license) are
+    classified once and extracted together in a single request per stage.
+
     Args:
-        image_path (str): Path to the image file
+        image_path (str | list[str]): Path to the image file, or paths to each image of the document
 
     Returns:
         DocumentProcessingResponse: Contains both the classification and extracted data
     """
     try:
-        classification = await identify_document(image_path)
+        # Encode once; classification and extraction share the same buffers
+        images = as_encoded_images(image_path)
+        classification = await identify_document(images)
         response = DocumentProcessingResponse(
             document_type=classification.document_type
         )
@@ -59,19 +63,28 @@ async def process_document(image_path: str) -> DocumentProcessingResponse:
             DocumentType.INDECIPHERABLE_DOCUMENT,
             DocumentType.NOT_A_DOCUMENT,
         ]:
-            if classification.document_type == DocumentType.AMERICAN_PASSPORT:
-                extracted_data_response = await extract_passport_data(image_path)
-                response.extracted_data = extracted_data_response.passport_data
-            elif classification.document_type == DocumentType.AMERICAN_DRIVERS_LICENSE:
-                extracted_data_response = await extract_license_data(image_path)
-                response.extracted_data = extracted_data_response.license_data
-            else:
+            extractor = get_extractor(classification.document_type)
+            if extractor is None:
                 print(classification.document_type)
                 print(classification.image_analysis)
-                raise UnsupportedDocumentTypeError("Document type not supported")
+                raise UnsupportedDocumentTypeError(
+                    "Document type not supported", document_type=classification.document_type
+                )
+
+            extracted_data_response = await extractor.extract(images)
+            response.extracted_data = getattr(extracted_data_response, extractor.data_attribute)
+            if len(images) > 1:
+                # Model output: drop unknown fields and image numbers out of range
+                response.field_sources = clean_field_sources(
+                    getattr(extracted_data_response, "field_sources", None),
+                    type(response.extracted_data).model_fields,
+                    len(images),
+                )
         else:
             print(classification.image_analysis)
-            raise DocumentNotRecognizedError("Document not recognized")
+            raise DocumentNotRecognizedError(
+                "Document not recognized", document_type=classification.document_type
+            )
 
         response.metadata = Metadata(
             classification=classification, extracted_data=extracted_data_response
@@ -79,6 +92,8 @@ async def process_document(image_path: str) -> DocumentProcessingResponse:
 
         return response
 
+    except (UnsupportedDocumentTypeError, DocumentNotRecognizedError):
+        raise
     except Exception as e:
         raise ValueError(f"Failed to process document: {str(e)}")
 
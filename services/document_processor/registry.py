@@ -0,0 +1,69 @@
+import importlib
+from typing import Awaitable, Callable, Dict, Optional
+
+from pydantic import BaseModel
+
+from services.document_processor.document_classification import DocumentType
+from utils.image_utils import ImageInput
+
+
+class ExtractorSpec(BaseModel):
+    """Where to find the extractor for a document type, imported on first use"""
+
+    module: str
+    function: str
+    # Attribute of the extractor's response holding the extracted fields
+    data_attribute: str
+
+
+class Extractor(BaseModel):
+    # Takes one image, or several images of the same document
+    extract: Callable[[ImageInput], Awaitable[BaseModel]]
+    data_attribute: str
+
+
+EXTRACTOR_SPECS: Dict[DocumentType, ExtractorSpec] = {
+    DocumentType.AMERICAN_PASSPORT: ExtractorSpec(
+        module="services.document_processor.passport_extraction",
+        function="extract_passport_data",
+        data_attribute="passport_data",
+    ),
+    # Foreign passports share the PassportData schema, with a prompt variant
+    DocumentType.FOREIGN_PASSPORT: ExtractorSpec(
+        module="services.document_processor.passport_extraction",
+        function="extract_foreign_passport_data",
+        data_attribute="passport_data",
+    ),
+    DocumentType.AMERICAN_DRIVERS_LICENSE: ExtractorSpec(
+        module="services.document_processor.license_extraction",
+        function="extract_license_data",
+        data_attribute="license_data",
+    ),
+}
+
+_loaded_extractors: Dict[DocumentType, Extractor] = {}
+
+
+def register_extractor(document_type: DocumentType, spec: ExtractorSpec) -> None:
+    """Register (or replace) the extractor for a document type"""
+    EXTRACTOR_SPECS[document_type] = spec
+    _loaded_extractors.pop(document_type, None)
+
+
+def get_extractor(document_type: DocumentType) -> Optional[Extractor]:
+    """Return the extractor for a document type, importing its module on first use"""
+    extractor = _loaded_extractors.get(document_type)
+    if extractor is not None:
+        return extractor
+
+    spec = EXTRACTOR_SPECS.get(document_type)
+    if spec is None:
+        return None
+
+    module = importlib.import_module(spec.module)
+    extractor = Extractor(
+        extract=getattr(module, spec.function),
+        data_attribute=spec.data_attribute,
+    )
+    _loaded_extractors[document_type] = extractor
+    return extractor
@@ -0,0 +1,94 @@
+from typing import Dict, List, Optional
+
+from bson.objectid import ObjectId
+from mongoengine import NotUniqueError
+from pydantic import BaseModel
+
+from models.document_artifact import DocumentArtifact
+from models.extracted_document_data import ExtractedDocumentData
+from services import stats_service
+from services.s3_service import S3Service
+
+
+class StoredImage(BaseModel):
+    path: str
+    sha256: str
+
+
+class DocumentWrite(BaseModel):
+    """Everything needed to persist a processed document, so the write can be replayed later"""
+
+    document_id: str
+    artifact_id: str
+    document_type: str
+    extracted_data: dict
+    needs_manual_review: bool
+    field_sources: Dict[str, int] = {}
+    metadata: dict = {}
+    images: List[StoredImage]
+    perceptual_hash: Optional[str] = None
+    near_duplicate_of: List[str] = []
+
+
+def image_urls(write: DocumentWrite, s3_service: S3Service) -> List[str]:
+    """The URLs the document's images are (or will be) stored at, from their content-addressed keys"""
+    return [
+        s3_service.get_public_url(
+            s3_service.build_document_key(
+                write.document_type, image.sha256, S3Service.file_extension(image.path)
+            )
+        )
+        for image in write.images
+    ]
+
+
+def store_document(write: DocumentWrite, s3_service: S3Service) -> List[str]:
+    """
+    Upload the images and save the artifact and document. Every step is idempotent
+    (content-addressed S3 keys, pre-assigned Mongo IDs), so a failed write can be retried
+    from the start. The document is only ever inserted: if it already exists, an earlier
+    attempt got through, and neither the stored document (which may since have been
+    reviewed) nor the stats counters are touched again.
+
+    Returns:
+        The S3 URLs of the images, in order
+    """
+    s3_urls = [
+        s3_service.upload_document(image.path, write.document_type, content_hash=image.sha256)
+        for image in write.images
+    ]
+    if not all(s3_urls):
+        raise Exception("Failed to upload to S3")
+
+    DocumentArtifact(
+        id=ObjectId(write.artifact_id),
+        document_id=ObjectId(write.document_id),
+        classification=write.metadata.get("classification") or {},
+        extraction=write.metadata.get("extracted_data") or {},
+    ).save()
+
+    document = ExtractedDocumentData(
+        id=ObjectId(write.document_id),
+        document_type=write.document_type,
+        extracted_data=write.extracted_data,
+        document_image_s3_url=s3_urls[0],
+        additional_image_s3_urls=s3_urls[1:],
+        field_sources=write.field_sources,
+        needs_manual_review=write.needs_manual_review,
+        metadata_summary=ExtractedDocumentData.build_metadata_summary(write.metadata),
+        artifact_id=ObjectId(write.artifact_id),
+        perceptual_hash=write.perceptual_hash,
+        near_duplicate_of=[ObjectId(id) for id in write.near_duplicate_of],
+    )
+    try:
+        document.save(force_insert=True)
+    except NotUniqueError:
+        print(f"Document {write.document_id} was already stored, skipping")
+        return s3_urls
+
+    stats_service.record_document({
+        "document_type": write.document_type,
+        "needs_manual_review": write.needs_manual_review,
+        "extracted_data": write.extracted_data,
+    })
+    return s3_urls
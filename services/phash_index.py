@@ -0,0 +1,193 @@
+"""
+Perceptual-hash index over stored documents, for flagging the same ID re-photographed
+and resubmitted (possibly across accounts) for review.
+
+A 9x8 dHash mostly captures the card's layout: two cards printed on the same template
+can hash identically, so a match is a fraud signal only, never a reason to reuse data.
+
+Each document's first image gets a 64-bit difference hash (dHash), stored on the
+document in Mongo and kept in memory in a multi-index hash table, which answers
+"all hashes within Hamming distance d" without comparing against every stored hash.
+
+Hashing needs the optional Pillow package; without it the index stays disabled.
+"""
+import asyncio
+import threading
+import traceback
+from datetime import timedelta
+from functools import lru_cache
+from itertools import combinations
+from typing import Dict, List, Optional, Set, Tuple
+
+from bson.objectid import ObjectId
+from pydantic import BaseModel
+
+from models.extracted_document_data import ExtractedDocumentData
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+HASH_SIZE = 8
+
+
+class NearDuplicate(BaseModel):
+    document_id: str
+    distance: int
+
+
+def compute_dhash(image_path: str) -> Optional[int]:
+    """64-bit difference hash: whether each pixel is brighter than its right neighbour on a 9x8 thumbnail"""
+    if Image is None:
+        return None
+    try:
+        with Image.open(image_path) as image:
+            # Let the JPEG decoder downscale while decoding instead of decoding full size
+            image.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))
+            # One byte per pixel in "L" mode
+            pixels = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.LANCZOS).tobytes()
+    except Exception:
+        # Unreadable or unsupported image format (e.g. HEIC without a plugin)
+        return None
+
+    value = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left = pixels[row * (HASH_SIZE + 1) + col]
+            right = pixels[row * (HASH_SIZE + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def to_hex(value: int) -> str:
+    return f"{value:016x}"
+
+
+class MultiIndexHashTable:
+    """
+    Multi-index hashing over 64-bit hashes: each hash is split into CHUNKS 16-bit chunks,
+    each with its own exact-match table. By pigeonhole, two hashes within Hamming distance d
+    differ in at most d // CHUNKS bits in at least one chunk, so a lookup only probes chunk
+    values within that small radius instead of walking the whole set. (A BK-tree prunes
+    poorly on 64-bit hashes, whose pairwise distances bunch up around 32.)
+    """
+
+    CHUNKS = 4
+    CHUNK_BITS = 64 // CHUNKS
+    CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+    def __init__(self):
+        self._tables: List[Dict[int, Set[int]]] = [{} for _ in range(self.CHUNKS)]
+        self._documents: Dict[int, List[str]] = {}
+        # Refreshes add from a worker thread while lookups run on the event loop
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self._documents.values())
+
+    def _chunks(self, value: int) -> List[int]:
+        return [(value >> (i * self.CHUNK_BITS)) & self.CHUNK_MASK for i in range(self.CHUNKS)]
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _flip_masks(cls, radius: int) -> Tuple[int, ...]:
+        masks = [0]
+        for bits in range(1, radius + 1):
+            for positions in combinations(range(cls.CHUNK_BITS), bits):
+                masks.append(sum(1 << p for p in positions))
+        return tuple(masks)
+
+    def add(self, value: int, document_id: str) -> None:
+        with self._lock:
+            if value in self._documents:
+                if document_id not in self._documents[value]:
+                    self._documents[value].append(document_id)
+                return
+            self._documents[value] = [document_id]
+            for table, chunk in zip(self._tables, self._chunks(value)):
+                table.setdefault(chunk, set()).add(value)
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, str]]:
+        """All (distance, document_id) pairs within max_distance, closest first"""
+        masks = self._flip_masks(max_distance // self.CHUNKS)
+        candidates: Set[int] = set()
+        matches = []
+        with self._lock:
+            for table, chunk in zip(self._tables, self._chunks(value)):
+                for mask in masks:
+                    bucket = table.get(chunk ^ mask)
+                    if bucket:
+                        candidates.update(bucket)
+
+            for candidate in candidates:
+                distance = (candidate ^ value).bit_count()
+                if distance <= max_distance:
+                    matches.extend((distance, document_id) for document_id in self._documents[candidate])
+        return sorted(matches)
+
+
+class PerceptualHashIndex:
+    def __init__(self, max_distance: int = 6, batch_size: int = 5000, refresh_lookback_seconds: float = 300.0):
+        self.max_distance = max_distance
+        self.batch_size = batch_size
+        # Document IDs are assigned before the write lands (and journaled writes land late),
+        # so each refresh re-reads a window of recent IDs; re-adding a document is a no-op
+        self.refresh_lookback = timedelta(seconds=refresh_lookback_seconds)
+        self._table = MultiIndexHashTable()
+        self._last_loaded_id: Optional[ObjectId] = None
+
+    @property
+    def enabled(self) -> bool:
+        return Image is not None
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def refresh(self) -> int:
+        """
+        Load hashes of documents saved since the last load (all of them on first call),
+        including those written by other workers. Returns the number of documents read.
+        """
+        collection = ExtractedDocumentData._get_collection()
+        cursor_id = None
+        if self._last_loaded_id is not None:
+            cursor_id = ObjectId.from_datetime(self._last_loaded_id.generation_time - self.refresh_lookback)
+
+        loaded = 0
+        while True:
+            query = {"perceptual_hash": {"$exists": True}}
+            if cursor_id is not None:
+                query["_id"] = {"$gt": cursor_id}
+            batch = list(
+                collection.find(query, {"perceptual_hash": 1})
+                .sort("_id", 1)
+                .limit(self.batch_size)
+            )
+            if not batch:
+                return loaded
+            for doc in batch:
+                self._table.add(int(doc["perceptual_hash"], 16), str(doc["_id"]))
+            cursor_id = batch[-1]["_id"]
+            if self._last_loaded_id is None or cursor_id > self._last_loaded_id:
+                self._last_loaded_id = cursor_id
+            loaded += len(batch)
+
+    def add(self, value: int, document_id: str) -> None:
+        self._table.add(value, document_id)
+
+    def lookup(self, value: int) -> List[NearDuplicate]:
+        return [
+            NearDuplicate(document_id=document_id, distance=distance)
+            for distance, document_id in self._table.search(value, self.max_distance)
+        ]
+
+    async def run_refresh(self, interval: float = 30.0) -> None:
+        """Refresh forever; cancel the task to stop"""
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception:
+                print(traceback.format_exc())
+            await asyncio.sleep(interval)
@@ -1,16 +1,44 @@
+import hashlib
+import threading
 import traceback
+from collections import OrderedDict
 from typing import Optional
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import NoCredentialsError, ClientError
 import os
-from datetime import datetime
+
+
+MB = 1024 * 1024
 
 
 class S3Service:
-    def __init__(self, bucket_name: str, aws_region: str = "us-east-1"):
+    def __init__(
+        self,
+        bucket_name: str,
+        aws_region: str = "us-east-1",
+        existing_keys_cache_size: int = 10_000,
+        multipart_threshold: int = 8 * MB,
+        multipart_chunksize: int = 8 * MB,
+        max_concurrency: int = 10,
+    ):
         self.bucket_name = bucket_name
         self.aws_region = aws_region
         self.s3_client = boto3.client("s3", region_name=aws_region)
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=max_concurrency,
+            use_threads=True,
+        )
+        self._bucket_checked = False
+        # LRU of keys known to exist in the bucket, so repeat uploads skip the HEAD request
+        self._existing_keys: OrderedDict[str, None] = OrderedDict()
+        self._existing_keys_cache_size = existing_keys_cache_size
+        self._existing_keys_lock = threading.Lock()
+        # HEAD on a missing key returns 403 instead of 404 without s3:ListBucket; in that case
+        # existence can't be told apart from access denied, so uploads always go through
+        self._head_allowed = True
 
     def _check_bucket_exists(self) -> bool:
         """Check if the configured bucket exists and is accessible."""
@@ -21,7 +49,9 @@ class S3Service:
             return False
 
     def _ensure_bucket_exists(self) -> None:
-        """Ensure the configured bucket exists, creating it if necessary."""
+        """Ensure the configured bucket exists, creating it if necessary. Checked once per instance."""
+        if self._bucket_checked:
+            return
         if not self._check_bucket_exists():
             try:
                 if self.aws_region == "us-east-1":
@@ -34,8 +64,80 @@ class S3Service:
                     )
             except ClientError as e:
                 raise Exception(f"Failed to create bucket: {str(e)}")
+        self._bucket_checked = True
+
+    def _remember_key(self, s3_key: str) -> None:
+        with self._existing_keys_lock:
+            self._existing_keys[s3_key] = None
+            self._existing_keys.move_to_end(s3_key)
+            if len(self._existing_keys) > self._existing_keys_cache_size:
+                self._existing_keys.popitem(last=False)
+
+    def _object_exists(self, s3_key: str) -> bool:
+        """
+        Check whether an object exists, consulting the local cache before issuing a HEAD.
+        Returns False when existence can't be determined, so the caller uploads anyway.
+        """
+        with self._existing_keys_lock:
+            if s3_key in self._existing_keys:
+                self._existing_keys.move_to_end(s3_key)
+                return True
+        if not self._head_allowed:
+            return False
+        try:
+            self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code in ("404", "NoSuchKey", "NotFound"):
+                return False
+            if code in ("403", "AccessDenied", "Forbidden"):
+                print("HEAD on S3 objects is forbidden (missing s3:ListBucket?), uploads will not be deduplicated")
+                self._head_allowed = False
+                return False
+            raise
+        self._remember_key(s3_key)
+        return True
+
+    @staticmethod
+    def hash_file(file_path: str, chunk_size: int = MB) -> str:
+        """SHA-256 of a file's contents, read in chunks."""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def file_extension(file_path: str) -> str:
+        return os.path.splitext(file_path)[1] or '.jpg'  # Default extension if none is found
+
+    @staticmethod
+    def build_document_key(document_type: str, content_hash: str, file_extension: str) -> str:
+        """
+        Content-addressed key for a document image. Identical images map to the same key,
+        and distinct images never collide regardless of upload time.
+        """
+        safe_document_type = document_type.lower().replace(' ', '_')
+        return f"documents/{safe_document_type}/{content_hash[:2]}/{content_hash}{file_extension}"
+
+    def upload_document(
+        self,
+        file_path: str,
+        document_type: str,
+        content_hash: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Upload a document image under a content-addressed key, skipping the upload
+        if an identical image is already stored.
 
-    def upload_document(self, file_path: str, document_type: str) -> Optional[str]:
+        Args:
+            file_path: Path to the image file
+            document_type: Document type, used as the key prefix
+            content_hash: SHA-256 hex digest of the file, computed if not provided
+
+        Returns:
+            str: Public URL for the object
+        """
         if not file_path or not isinstance(file_path, str):
             raise ValueError("Invalid file path")
 
@@ -51,20 +153,21 @@ class S3Service:
         try:
             self._ensure_bucket_exists()
 
-            timestamp = datetime.utcnow().strftime('%Y/%m/%d/%H%M%S')
-            file_extension = os.path.splitext(file_path)[1]
-            if not file_extension:
-                file_extension = '.jpg'  # Default extension if none is found
-
-            safe_document_type = document_type.lower().replace(' ', '_')
-            s3_key = f"documents/{safe_document_type}/{timestamp}{file_extension}"
-
-            self.s3_client.upload_file(
-                Filename=file_path,
-                Bucket=self.bucket_name,
-                Key=s3_key
+            s3_key = self.build_document_key(
+                document_type,
+                content_hash or self.hash_file(file_path),
+                self.file_extension(file_path),
             )
 
+            if not self._object_exists(s3_key):
+                self.s3_client.upload_file(
+                    Filename=file_path,
+                    Bucket=self.bucket_name,
+                    Key=s3_key,
+                    Config=self.transfer_config,
+                )
+                self._remember_key(s3_key)
+
             return self.get_public_url(s3_key)
 
         except NoCredentialsError:
@@ -0,0 +1,154 @@
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from bson.objectid import ObjectId
+from pymongo.errors import PyMongoError
+
+from models.document_stats import DocumentStats
+from models.extracted_document_data import ExtractedDocumentData
+
+
+GLOBAL_STATS_ID = "global"
+
+STATS_PROJECTION = {
+    "document_type": 1,
+    "needs_manual_review": 1,
+    "manual_review_completed": 1,
+    "rejected": 1,
+    "extracted_data": 1,
+}
+
+
+def review_status(doc: dict) -> str:
+    if doc.get("rejected"):
+        return "rejected"
+    if doc.get("manual_review_completed"):
+        return "approved"
+    if doc.get("needs_manual_review"):
+        return "pending"
+    return "not_required"
+
+
+def document_counters(doc: dict) -> Counter:
+    """The counter contributions of a single (raw) document"""
+    document_type = doc.get("document_type")
+    counters = Counter(
+        {
+            "total": 1,
+            f"by_type.{document_type}": 1,
+            f"review_status.{review_status(doc)}": 1,
+        }
+    )
+    for field, data in (doc.get("extracted_data") or {}).items():
+        counters[f"field_confidence.{document_type}.{field}.total"] += 1
+        if isinstance(data, dict) and data.get("confidence") == "unsure":
+            counters[f"field_confidence.{document_type}.{field}.unsure"] += 1
+    return counters
+
+
+def _apply(increments: Counter) -> None:
+    increments = {path: value for path, value in increments.items() if value}
+    if not increments:
+        return
+    try:
+        DocumentStats._get_collection().update_one(
+            {"_id": GLOBAL_STATS_ID},
+            {"$inc": increments, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+    except PyMongoError as e:
+        # Counters drift until the next reconcile, but the document write itself succeeded
+        print(f"Failed to update document stats: {str(e)}")
+
+
+def record_document(doc: dict) -> None:
+    """Count a newly saved document"""
+    _apply(document_counters(doc))
+
+
+def record_reviews(before: Iterable[dict], updates: Dict[ObjectId, dict]) -> None:
+    """
+    Apply the counter changes of a batch of review updates in a single `$inc`.
+
+    Args:
+        before: Raw documents (STATS_PROJECTION) as they were prior to the updates
+        updates: The `$set` fields applied to each document, keyed by ID
+    """
+    increments = Counter()
+    for doc in before:
+        update = updates.get(doc["_id"])
+        if not update:
+            continue
+
+        after = {**doc, "extracted_data": {k: dict(v) for k, v in (doc.get("extracted_data") or {}).items()}}
+        for path, value in update.items():
+            parts = path.split(".")
+            if len(parts) == 1:
+                after[path] = value
+            elif parts[0] == "extracted_data" and len(parts) == 3:
+                after["extracted_data"].setdefault(parts[1], {})[parts[2]] = value
+
+        increments.update(document_counters(after))
+        increments.subtract(document_counters(doc))
+    _apply(increments)
+
+
+def fetch_for_stats(ids: List[ObjectId]) -> List[dict]:
+    """Read the prior state of documents about to be updated, in one query"""
+    return list(
+        ExtractedDocumentData._get_collection().find({"_id": {"$in": ids}}, STATS_PROJECTION)
+    )
+
+
+def get_stats() -> dict:
+    stats = DocumentStats._get_collection().find_one({"_id": GLOBAL_STATS_ID}) or {}
+    field_confidence = stats.get("field_confidence", {})
+    return {
+        "total": stats.get("total", 0),
+        "by_type": stats.get("by_type", {}),
+        "review_status": stats.get("review_status", {}),
+        "field_unsure_rates": {
+            document_type: {
+                field: {
+                    **counts,
+                    "unsure_rate": round(counts.get("unsure", 0) / counts["total"], 4)
+                    if counts.get("total") else 0.0,
+                }
+                for field, counts in fields.items()
+            }
+            for document_type, fields in field_confidence.items()
+        },
+        "updated_at": stats.get("updated_at"),
+    }
+
+
+def reconcile(batch_size: int = 1000) -> dict:
+    """
+    Recompute all counters from scratch, scanning the collection in `_id` order in
+    batches, and replace the stored stats. Writes that land during the scan are only
+    reflected if they fall after the scan position, so run it during quiet periods.
+    """
+    collection = ExtractedDocumentData._get_collection()
+    totals = Counter()
+    last_id: Optional[ObjectId] = None
+
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = list(collection.find(query, STATS_PROJECTION).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+        for doc in batch:
+            totals.update(document_counters(doc))
+        last_id = batch[-1]["_id"]
+
+    stats = {"_id": GLOBAL_STATS_ID, "updated_at": datetime.utcnow()}
+    for path, value in totals.items():
+        target = stats
+        *parents, leaf = path.split(".")
+        for part in parents:
+            target = target.setdefault(part, {})
+        target[leaf] = value
+
+    DocumentStats._get_collection().replace_one({"_id": GLOBAL_STATS_ID}, stats, upsert=True)
+    return stats
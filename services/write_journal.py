@@ -0,0 +1,162 @@
+import asyncio
+import json
+import os
+import random
+import shutil
+import time
+import traceback
+from typing import Callable, Optional
+
+from services.document_store import DocumentWrite
+
+
+class WriteJournal:
+    """
+    Durable local journal of document writes that failed against S3 or Mongo.
+
+    Each entry is a directory holding the write payload and copies of its images, so the
+    LLM results already paid for survive restarts. A background loop replays due entries
+    with exponential backoff; entries that keep failing are moved to a dead-letter
+    directory for inspection.
+
+    Every worker process replays the same directory, so an entry is claimed by renaming
+    it into processing/ before it is applied. Claims left behind by a crashed worker are
+    returned to pending/ once older than claim_timeout.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        apply: Callable[[DocumentWrite], object],
+        max_attempts: int = 10,
+        base_delay: float = 5.0,
+        max_delay: float = 600.0,
+        claim_timeout: float = 900.0,
+    ):
+        self.incoming_dir = os.path.join(directory, "incoming")
+        self.pending_dir = os.path.join(directory, "pending")
+        self.processing_dir = os.path.join(directory, "processing")
+        self.dead_letter_dir = os.path.join(directory, "dead_letter")
+        self.apply = apply
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.claim_timeout = claim_timeout
+        for path in (self.incoming_dir, self.pending_dir, self.processing_dir, self.dead_letter_dir):
+            os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def _write_entry(entry_dir: str, entry: dict) -> None:
+        # Write-then-rename so a crash never leaves a half-written entry
+        temp_path = os.path.join(entry_dir, "entry.json.tmp")
+        with open(temp_path, "w") as f:
+            json.dump(entry, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, os.path.join(entry_dir, "entry.json"))
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    def enqueue(self, write: DocumentWrite, error: str = "") -> None:
+        """Persist a failed write, copying its images into the journal"""
+        # Assembled outside pending/ so replay never sees a partial entry
+        entry_dir = os.path.join(self.incoming_dir, write.document_id)
+        os.makedirs(entry_dir, exist_ok=True)
+
+        journaled = write.model_copy(deep=True)
+        for index, image in enumerate(journaled.images):
+            journaled_path = os.path.join(entry_dir, f"image-{index}{os.path.splitext(image.path)[1]}")
+            shutil.copyfile(image.path, journaled_path)
+            image.path = journaled_path
+
+        self._write_entry(entry_dir, {
+            "write": journaled.model_dump(),
+            "attempts": 1,
+            "next_attempt_at": time.time() + self._backoff(1),
+            "last_error": error,
+        })
+        os.rename(entry_dir, os.path.join(self.pending_dir, write.document_id))
+        print(f"Journaled document write {write.document_id} for retry: {error}")
+
+    def pending_count(self) -> int:
+        return len(os.listdir(self.pending_dir))
+
+    def _claim(self, document_id: str) -> Optional[str]:
+        """Atomically take an entry out of pending/, or None if another worker got it first"""
+        claimed_dir = os.path.join(self.processing_dir, document_id)
+        try:
+            os.rename(os.path.join(self.pending_dir, document_id), claimed_dir)
+        except OSError:
+            return None
+        # The claim's age is its directory mtime, see _release_stale_claims
+        os.utime(claimed_dir)
+        return claimed_dir
+
+    def _release_stale_claims(self) -> None:
+        for document_id in os.listdir(self.processing_dir):
+            claimed_dir = os.path.join(self.processing_dir, document_id)
+            try:
+                if time.time() - os.path.getmtime(claimed_dir) < self.claim_timeout:
+                    continue
+                os.rename(claimed_dir, os.path.join(self.pending_dir, document_id))
+                print(f"Released stale claim on journaled document write {document_id}")
+            except OSError:
+                # Finished or released by another worker in the meantime
+                continue
+
+    @staticmethod
+    def _load_write(entry_dir: str, entry: dict) -> DocumentWrite:
+        # Entries move between directories, so images are found relative to the entry
+        write = DocumentWrite(**entry["write"])
+        for image in write.images:
+            image.path = os.path.join(entry_dir, os.path.basename(image.path))
+        return write
+
+    def replay_due(self) -> int:
+        """Retry every entry whose backoff has elapsed. Returns the number that succeeded."""
+        self._release_stale_claims()
+        succeeded = 0
+        for document_id in sorted(os.listdir(self.pending_dir)):
+            entry_path = os.path.join(self.pending_dir, document_id, "entry.json")
+            try:
+                with open(entry_path) as f:
+                    if json.load(f)["next_attempt_at"] > time.time():
+                        continue
+            except (FileNotFoundError, ValueError):
+                continue
+
+            entry_dir = self._claim(document_id)
+            if entry_dir is None:
+                continue
+            with open(os.path.join(entry_dir, "entry.json")) as f:
+                entry = json.load(f)
+
+            try:
+                self.apply(self._load_write(entry_dir, entry))
+            except Exception as e:
+                entry["attempts"] += 1
+                entry["last_error"] = str(e)
+                dead = entry["attempts"] >= self.max_attempts
+                if not dead:
+                    entry["next_attempt_at"] = time.time() + self._backoff(entry["attempts"])
+                self._write_entry(entry_dir, entry)
+                os.rename(entry_dir, os.path.join(self.dead_letter_dir if dead else self.pending_dir, document_id))
+                if dead:
+                    print(f"Document write {document_id} moved to dead letter after {entry['attempts']} attempts")
+                continue
+
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            succeeded += 1
+            print(f"Replayed journaled document write {document_id}")
+        return succeeded
+
+    async def run(self, interval: float = 5.0) -> None:
+        """Replay due entries forever; cancel the task to stop"""
+        while True:
+            try:
+                await asyncio.to_thread(self.replay_due)
+            except Exception:
+                print(traceback.format_exc())
+            await asyncio.sleep(interval)
@@ -0,0 +1,20 @@
+from utils.image_utils import clean_field_sources
+
+
+def test_clean_field_sources_drops_invalid_entries():
+    field_sources = {
+        "first_name": 1,
+        "last_name": 2,
+        "birth_date": 0,
+        "address": 3,
+        "sex": True,
+        "made_up_field": 1,
+    }
+    assert clean_field_sources(field_sources, ["first_name", "last_name", "birth_date", "address", "sex"], 2) == {
+        "first_name": 1,
+        "last_name": 2,
+    }
+
+
+def test_clean_field_sources_handles_missing_sources():
+    assert clean_field_sources(None, ["first_name"], 2) == {}
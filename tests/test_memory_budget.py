@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from utils.memory_budget import ByteBudget, MemoryBudgetExceededError, ReservationTooLargeError
+
+
+def _budget(max_bytes=100, max_wait_seconds=1.0):
+    return ByteBudget(max_bytes=max_bytes, max_wait_seconds=max_wait_seconds, overhead_factor=1.0)
+
+
+def test_waiting_reservations_are_admitted_in_arrival_order():
+    async def scenario():
+        budget = _budget()
+        order = []
+        release_first = asyncio.Event()
+
+        async def hold(name, size, until=None):
+            async with budget.reserve(size):
+                order.append(name)
+                if until:
+                    await until.wait()
+                else:
+                    await asyncio.sleep(0.01)
+
+        first = asyncio.create_task(hold("first", 50, release_first))
+        await asyncio.sleep(0)
+        large = asyncio.create_task(hold("large", 100))
+        await asyncio.sleep(0)
+        # These would fit next to "first" but arrived after "large"
+        small = [asyncio.create_task(hold(f"small-{i}", 50)) for i in range(5)]
+        await asyncio.sleep(0.01)
+        assert order == ["first"]
+
+        release_first.set()
+        await asyncio.gather(first, large, *small)
+        return order
+
+    order = asyncio.run(scenario())
+    assert order[:2] == ["first", "large"]
+
+
+def test_timed_out_head_unblocks_the_queue():
+    async def scenario():
+        budget = _budget(max_wait_seconds=0.05)
+        async with budget.reserve(60):
+            large = asyncio.create_task(budget.reserve(100).__aenter__())
+            await asyncio.sleep(0.03)
+            small = asyncio.create_task(budget.reserve(40).__aenter__())
+            with pytest.raises(MemoryBudgetExceededError):
+                await large
+            await small
+        assert budget.metrics()["in_flight_bytes"] == 40
+        assert budget.metrics()["waiting"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_reservation_larger_than_budget_is_rejected_immediately():
+    async def scenario():
+        with pytest.raises(ReservationTooLargeError):
+            async with _budget().reserve(101):
+                pass
+
+    asyncio.run(scenario())
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from services.phash_index import MultiIndexHashTable, compute_dhash
+
+Image = pytest.importorskip("PIL.Image")
+ImageDraw = pytest.importorskip("PIL.ImageDraw")
+
+
+def _card_image(path, seed, size=(640, 400), quality=90):
+    """Synthetic ID-card-like image: random blocks of text-like bars on a gradient"""
+    rng = random.Random(seed)
+    image = Image.new("RGB", (640, 400))
+    draw = ImageDraw.Draw(image)
+    for x in range(640):
+        draw.line([(x, 0), (x, 400)], fill=(x * 255 // 640, 120, 200))
+    for _ in range(12):
+        x, y = rng.randrange(0, 560), rng.randrange(0, 340)
+        shade = rng.randrange(0, 255)
+        draw.rectangle([x, y, x + rng.randrange(20, 80), y + rng.randrange(10, 60)], fill=(shade,) * 3)
+    image.resize(size).save(path, quality=quality)
+    return str(path)
+
+
+def _distance(a, b):
+    return (a ^ b).bit_count()
+
+
+def test_dhash_is_stable_across_recompression_and_resizing(tmp_path):
+    original = compute_dhash(_card_image(tmp_path / "a.jpg", seed=1))
+    resubmitted = compute_dhash(_card_image(tmp_path / "b.jpg", seed=1, size=(1280, 800), quality=60))
+    assert original is not None and 0 <= original < 2**64
+    assert _distance(original, resubmitted) <= 6
+
+
+def test_dhash_separates_different_images(tmp_path):
+    first = compute_dhash(_card_image(tmp_path / "a.png", seed=1))
+    second = compute_dhash(_card_image(tmp_path / "b.png", seed=2))
+    assert _distance(first, second) > 6
+
+
+def test_dhash_of_unreadable_file_is_none(tmp_path):
+    path = tmp_path / "broken.jpg"
+    path.write_bytes(b"not an image")
+    assert compute_dhash(str(path)) is None
+
+
+def test_multi_index_search_matches_brute_force():
+    rng = random.Random(0)
+    table = MultiIndexHashTable()
+    values = [rng.getrandbits(64) for _ in range(5000)]
+    for i, value in enumerate(values):
+        table.add(value, str(i))
+
+    for flips in (0, 3, 6, 9):
+        query = values[flips]
+        for bit in rng.sample(range(64), flips):
+            query ^= 1 << bit
+        expected = sorted(
+            (_distance(value, query), str(i))
+            for i, value in enumerate(values)
+            if _distance(value, query) <= 6
+        )
+        assert table.search(query, 6) == expected
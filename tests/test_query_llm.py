@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from pydantic import BaseModel
+
+from utils import query_llm
+from utils.model_router import ModelRouter
+from utils.query_llm import LLMCompletion, query_llm_with_fallbacks
+
+
+class Answer(BaseModel):
+    model: str
+    unsure: int
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Transport answering with a per-model number of unsure fields, recording the call order"""
+    calls = []
+
+    def install(unsure_by_model):
+        async def transport(model, response_schema, messages, **kwargs):
+            calls.append(model)
+            return LLMCompletion(content=Answer(model=model, unsure=unsure_by_model[model]).model_dump_json())
+
+        monkeypatch.setattr(query_llm, "_transport", transport)
+        return calls
+
+    return install
+
+
+def _query(models, stage=None):
+    return asyncio.run(query_llm_with_fallbacks(
+        models=models,
+        response_schema=Answer,
+        messages=[],
+        stage=stage,
+        count_issues=lambda answer: answer.unsure,
+    ))
+
+
+def test_escalates_to_stronger_model(fake_llm):
+    calls = fake_llm({"small": 2, "large": 0})
+    assert _query(["small", "large"]).model == "large"
+    assert calls == ["small", "large"]
+
+
+def test_never_escalates_down_to_a_demoted_model(fake_llm, monkeypatch):
+    router = ModelRouter(model_costs={"small": 0.2, "large": 0.9}, latency_slos={}, min_samples=1, explore_rate=0)
+    router.record("extraction", "small", True, 1.0, needs_review=True)
+    monkeypatch.setattr(query_llm, "model_router", router)
+    calls = fake_llm({"small": 0, "large": 1})
+
+    answer = _query(["small", "large"], stage="extraction")
+
+    assert calls == ["large"]
+    assert answer.model == "large"
+
+
+def test_returns_response_with_fewest_issues(fake_llm):
+    fake_llm({"small": 1, "medium": 3, "large": 2})
+    assert _query(["small", "medium", "large"]).model == "small"
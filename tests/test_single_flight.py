@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def test_duplicates_share_one_call():
+    async def scenario():
+        single_flight = SingleFlight("test")
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"ok": True}
+
+        results = await asyncio.gather(*(single_flight.do("key", work) for _ in range(5)))
+        return results, calls
+
+    results, calls = asyncio.run(scenario())
+    assert results == [{"ok": True}] * 5
+    assert len(calls) == 1
+
+
+def test_followers_take_over_when_leader_is_cancelled():
+    async def scenario():
+        single_flight = SingleFlight("test")
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return len(calls)
+
+        leader = asyncio.create_task(single_flight.do("key", work))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(single_flight.do("key", work)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers), calls
+
+    results, calls = asyncio.run(scenario())
+    # One follower re-runs the work and the others share its result
+    assert results == [2, 2, 2]
+    assert len(calls) == 2
+
+
+def test_cancelled_follower_does_not_cancel_the_leader():
+    async def scenario():
+        single_flight = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        leader = asyncio.create_task(single_flight.do("key", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(single_flight.do("key", work))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(scenario()) == "done"
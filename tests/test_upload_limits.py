@@ -0,0 +1,59 @@
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from utils.upload_utils import RequestSizeLimitMiddleware
+
+MAX_BYTES = 64 * 1024
+
+
+def _client():
+    app = FastAPI()
+    app.state.handled = 0
+    app.add_middleware(RequestSizeLimitMiddleware, limits={"/upload": MAX_BYTES})
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        app.state.handled += 1
+        return {"size": len(await file.read())}
+
+    return app, TestClient(app)
+
+
+def _multipart(size):
+    boundary = "test-boundary"
+    body = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="a.jpg"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + b"x" * size + f"\r\n--{boundary}--\r\n".encode()
+    return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+def test_small_upload_passes_through():
+    app, client = _client()
+    body, headers = _multipart(1024)
+    response = client.post("/upload", content=body, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"size": 1024}
+
+
+def test_oversized_content_length_is_rejected_before_the_handler():
+    app, client = _client()
+    body, headers = _multipart(MAX_BYTES * 2)
+    response = client.post("/upload", content=body, headers=headers)
+    assert response.status_code == 413
+    assert app.state.handled == 0
+
+
+def test_oversized_chunked_body_is_rejected_while_streaming():
+    app, client = _client()
+    body, headers = _multipart(MAX_BYTES * 4)
+
+    # No Content-Length: the body is sent chunked and counted as it arrives
+    def chunks():
+        for start in range(0, len(body), 8192):
+            yield body[start:start + 8192]
+
+    response = client.post("/upload", content=chunks(), headers=headers)
+    assert response.status_code == 413
+    assert app.state.handled == 0
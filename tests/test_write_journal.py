@@ -0,0 +1,84 @@
+import json
+import os
+import threading
+import time
+
+from services.document_store import DocumentWrite, StoredImage
+from services.write_journal import WriteJournal
+
+
+def _write(document_id, image_path):
+    return DocumentWrite(
+        document_id=document_id,
+        artifact_id="artifact",
+        document_type="american_passport",
+        extracted_data={},
+        needs_manual_review=False,
+        images=[StoredImage(path=image_path, sha256="hash")],
+    )
+
+
+def _make_due(journal):
+    for document_id in os.listdir(journal.pending_dir):
+        entry_path = os.path.join(journal.pending_dir, document_id, "entry.json")
+        with open(entry_path) as f:
+            entry = json.load(f)
+        entry["next_attempt_at"] = 0
+        with open(entry_path, "w") as f:
+            json.dump(entry, f)
+
+
+def test_concurrent_workers_apply_each_entry_once(tmp_path):
+    image_path = tmp_path / "front.jpg"
+    image_path.write_bytes(b"image")
+    applied = []
+    lock = threading.Lock()
+
+    def apply(write):
+        with open(write.images[0].path, "rb") as f:
+            assert f.read() == b"image"
+        time.sleep(0.01)
+        with lock:
+            applied.append(write.document_id)
+
+    journals = [WriteJournal(str(tmp_path / "journal"), apply) for _ in range(4)]
+    for i in range(20):
+        journals[0].enqueue(_write(f"doc-{i}", str(image_path)))
+    _make_due(journals[0])
+
+    workers = [threading.Thread(target=journal.replay_due) for journal in journals]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert sorted(applied) == sorted(f"doc-{i}" for i in range(20))
+    assert journals[0].pending_count() == 0
+    assert os.listdir(journals[0].processing_dir) == []
+
+
+def test_failing_entry_moves_to_dead_letter(tmp_path):
+    image_path = tmp_path / "front.jpg"
+    image_path.write_bytes(b"image")
+
+    def apply(write):
+        raise RuntimeError("mongo down")
+
+    journal = WriteJournal(str(tmp_path / "journal"), apply, max_attempts=2)
+    journal.enqueue(_write("doc", str(image_path)))
+    _make_due(journal)
+    journal.replay_due()
+
+    assert journal.pending_count() == 0
+    assert os.listdir(journal.dead_letter_dir) == ["doc"]
+
+
+def test_stale_claim_is_returned_to_pending(tmp_path):
+    journal = WriteJournal(str(tmp_path / "journal"), lambda write: None, claim_timeout=60)
+    claimed_dir = os.path.join(journal.processing_dir, "doc")
+    os.makedirs(claimed_dir)
+    os.utime(claimed_dir, (0, 0))
+
+    journal._release_stale_claims()
+
+    assert os.listdir(journal.pending_dir) == ["doc"]
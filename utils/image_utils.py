@@ -1,6 +1,83 @@
 import base64
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from pydantic import BaseModel
+
+from utils.upload_utils import sniff_image_type
+
+
+# Appended to extraction prompts when several images of one document are sent together
+MULTI_IMAGE_INSTRUCTIONS = """
+                            The images are the sides or pages of a single document, numbered 1, 2, ... in the order
+                            given. Combine them into one set of fields, using whichever image shows each field most
+                            clearly, and record in field_sources the number of the image each field was read from.
+                            """
 
 
 def encode_image(image_path):
     with open(image_path, "rb") as image_file:
         return base64.b64encode(image_file.read()).decode("utf-8")
+
+
+class EncodedImage(BaseModel):
+    """
+    An image and its base64 data URL, encoded once per request and shared by every LLM
+    call on it, instead of each stage reading and encoding its own copy.
+    """
+
+    path: str
+    data_url: str
+
+    @classmethod
+    def from_path(cls, image_path: str) -> "EncodedImage":
+        with open(image_path, "rb") as image_file:
+            content = image_file.read()
+        mime_type, _ = sniff_image_type(content[:16]) or ("image/jpeg", ".jpg")
+        return cls(
+            path=image_path,
+            data_url=f"data:{mime_type};base64,{base64.b64encode(content).decode('utf-8')}",
+        )
+
+
+ImageInput = Union[str, EncodedImage, List[Union[str, EncodedImage]]]
+
+
+def as_encoded_images(images: ImageInput) -> List[EncodedImage]:
+    """Normalize one or several image paths (or already encoded images) to encoded images"""
+    if not isinstance(images, list):
+        images = [images]
+    return [
+        image if isinstance(image, EncodedImage) else EncodedImage.from_path(image)
+        for image in images
+    ]
+
+
+def build_image_content(images: List[EncodedImage]) -> List[Dict[str, Any]]:
+    """One image_url message part per image, in order"""
+    return [
+        {
+            "type": "image_url",
+            "image_url": {"url": image.data_url},
+        }
+        for image in images
+    ]
+
+
+def clean_field_sources(
+    field_sources: Optional[Dict[str, int]],
+    field_names: Iterable[str],
+    image_count: int,
+) -> Dict[str, int]:
+    """
+    Keep only the field_sources entries a model returned for known fields with a 1-based
+    image number in range. Fields without a valid entry are left out (source unknown).
+    """
+    field_names = set(field_names)
+    return {
+        field: image_number
+        for field, image_number in (field_sources or {}).items()
+        if field in field_names
+        and isinstance(image_number, int)
+        and not isinstance(image_number, bool)
+        and 1 <= image_number <= image_count
+    }
@@ -0,0 +1,154 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import time
+from enum import Enum
+from typing import Any, Dict, List, Optional, Type
+
+from pydantic import BaseModel
+
+from config.settings import get_settings
+from utils.query_llm import (
+    LLMCompletion,
+    Transport,
+    fireworks_transport,
+    get_json_schema,
+    set_transport,
+)
+
+
+class CassetteMode(Enum):
+    RECORD = "record"
+    REPLAY = "replay"
+    PASSTHROUGH = "passthrough"
+
+
+class CassetteMissError(LookupError):
+    pass
+
+
+class LLMCassette:
+    """
+    Pluggable LLM transport that records completions to disk and replays them later.
+
+    Entries are keyed by model, response schema, prompt text, request options and the
+    hashes of the images in the request, and stored as gzipped JSON lines. Replayed
+    completions are delayed by their recorded latency (scaled), or by a fixed latency,
+    so load tests see realistic timings without network access.
+
+    Modes:
+        record: replay known requests, fetch and store unknown ones
+        replay: replay known requests, raise CassetteMissError for unknown ones
+        passthrough: always call the underlying transport, never touch the cassette
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: CassetteMode = CassetteMode.REPLAY,
+        latency: Optional[float] = None,
+        latency_scale: float = 1.0,
+        transport: Transport = fireworks_transport,
+    ):
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.transport = transport
+        self.entries: Dict[str, dict] = {}
+
+        if mode != CassetteMode.PASSTHROUGH and os.path.exists(path):
+            self._load()
+
+    def _load(self) -> None:
+        # Appended recordings are separate gzip members, which gzip reads back as one stream
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.entries[entry["k"]] = entry
+
+    def _append(self, entry: dict) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with gzip.open(self.path, "at", encoding="utf-8") as f:
+            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    @staticmethod
+    def build_key(
+        model: str,
+        response_schema: Type[BaseModel],
+        messages: List[Dict[str, Any]],
+        **kwargs,
+    ) -> str:
+        digest = hashlib.sha256()
+        digest.update(model.encode("utf-8"))
+        digest.update(response_schema.__name__.encode("utf-8"))
+        digest.update(json.dumps(get_json_schema(response_schema), sort_keys=True).encode("utf-8"))
+        digest.update(json.dumps(kwargs, sort_keys=True, default=str).encode("utf-8"))
+        for message in messages:
+            digest.update(message["role"].encode("utf-8"))
+            content = message["content"]
+            parts = content if isinstance(content, list) else [{"type": "text", "text": content}]
+            for part in parts:
+                if part["type"] == "image_url":
+                    image_hash = hashlib.sha256(part["image_url"]["url"].encode("utf-8")).hexdigest()
+                    digest.update(image_hash.encode("utf-8"))
+                else:
+                    digest.update(part.get("text", "").encode("utf-8"))
+        return digest.hexdigest()
+
+    async def __call__(
+        self,
+        model: str,
+        response_schema: Type[BaseModel],
+        messages: List[Dict[str, Any]],
+        **kwargs,
+    ) -> LLMCompletion:
+        if self.mode == CassetteMode.PASSTHROUGH:
+            return await self.transport(model, response_schema, messages, **kwargs)
+
+        key = self.build_key(model, response_schema, messages, **kwargs)
+        entry = self.entries.get(key)
+
+        if entry is not None:
+            latency = self.latency if self.latency is not None else entry["l"] * self.latency_scale
+            if latency > 0:
+                await asyncio.sleep(latency)
+            return LLMCompletion(content=entry["c"], usage=entry["u"])
+
+        if self.mode == CassetteMode.REPLAY:
+            raise CassetteMissError(f"No recorded {response_schema.__name__} response for {model}")
+
+        start = time.perf_counter()
+        completion = await self.transport(model, response_schema, messages, **kwargs)
+        entry = {
+            "k": key,
+            "c": completion.content,
+            "u": completion.usage,
+            "l": round(time.perf_counter() - start, 4),
+        }
+        self.entries[key] = entry
+        self._append(entry)
+        return completion
+
+
+def install_cassette_from_settings() -> Optional[LLMCassette]:
+    """Route LLM calls through a cassette when llm_cassette_mode is record or replay"""
+    settings = get_settings()
+    mode = CassetteMode(settings.llm_cassette_mode)
+    if mode == CassetteMode.PASSTHROUGH:
+        return None
+
+    cassette = LLMCassette(
+        path=settings.llm_cassette_path,
+        mode=mode,
+        latency=settings.llm_cassette_latency_seconds,
+        latency_scale=settings.llm_cassette_latency_scale,
+    )
+    set_transport(cassette)
+    print(f"LLM cassette in {mode.value} mode at {settings.llm_cassette_path} ({len(cassette.entries)} entries)")
+    return cassette
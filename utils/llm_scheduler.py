@@ -0,0 +1,202 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import get_settings
+
+
+class Priority(Enum):
+    INTERACTIVE = "interactive"
+    RE_REVIEW = "re_review"
+    BATCH = "batch"
+
+
+# Lower rank is served first
+PRIORITY_RANK = {
+    Priority.INTERACTIVE: 0,
+    Priority.RE_REVIEW: 1,
+    Priority.BATCH: 2,
+}
+
+DEFAULT_TENANT = "default"
+
+_request_context: ContextVar[Tuple[Priority, str]] = ContextVar(
+    "llm_request_context", default=(Priority.INTERACTIVE, DEFAULT_TENANT)
+)
+
+
+def set_request_context(priority: Priority, tenant: str) -> None:
+    """Set the priority class and tenant that LLM calls in the current task are scheduled under"""
+    _request_context.set((priority, tenant))
+
+
+class AdmissionRejectedError(Exception):
+    def __init__(self, priority: Priority, estimated_wait: float):
+        self.priority = priority
+        self.estimated_wait = estimated_wait
+        self.retry_after = max(1, math.ceil(estimated_wait))
+        super().__init__(
+            f"Estimated {priority.value} queue wait of {estimated_wait:.1f}s exceeds the SLO"
+        )
+
+
+class _Waiter:
+    __slots__ = ("priority", "tenant", "future", "enqueued_at", "cancelled")
+
+    def __init__(self, priority: Priority, tenant: str, future: asyncio.Future):
+        self.priority = priority
+        self.tenant = tenant
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+        self.cancelled = False
+
+
+class LLMScheduler:
+    """
+    Limits concurrent LLM calls and decides who goes next when the limit is reached.
+
+    Priority classes are served strictly in rank order. Within a class, tenants share
+    capacity by weighted fair queuing (start-time fair queuing over virtual finish tags),
+    so one tenant's backlog can't starve the others. Admission control estimates the
+    queue wait for a new request from the queue ahead of it and the average slot hold
+    time, and rejects it when that exceeds the class's SLO.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        queue_slo_seconds: Dict[str, float],
+        tenant_weights: Optional[Dict[str, float]] = None,
+        calls_per_request: int = 2,
+    ):
+        self.max_concurrency = max_concurrency
+        self.queue_slo_seconds = queue_slo_seconds
+        self.tenant_weights = tenant_weights or {}
+        self.calls_per_request = calls_per_request
+
+        self._in_flight = 0
+        self._queue: List[Tuple[int, float, int, _Waiter]] = []
+        self._sequence = itertools.count()
+        self._virtual_time: Dict[int, float] = {}
+        self._last_finish: Dict[Tuple[int, str], float] = {}
+        # Exponentially weighted averages, in seconds
+        self._avg_service_time = 1.0
+        self._avg_wait: Dict[Priority, float] = {priority: 0.0 for priority in Priority}
+        self._admitted: Dict[Priority, int] = {priority: 0 for priority in Priority}
+        self._rejected: Dict[Priority, int] = {priority: 0 for priority in Priority}
+
+    @classmethod
+    def from_settings(cls) -> "LLMScheduler":
+        settings = get_settings()
+        return cls(
+            max_concurrency=settings.llm_max_concurrency,
+            queue_slo_seconds=settings.llm_queue_slo_seconds,
+            tenant_weights=settings.llm_tenant_weights,
+        )
+
+    def _queued_ahead(self, rank: int) -> int:
+        return sum(1 for r, _, _, waiter in self._queue if r <= rank and not waiter.cancelled)
+
+    def estimate_wait(self, priority: Priority) -> float:
+        """Estimated time a new request of this class would spend queued for its LLM calls"""
+        rank = PRIORITY_RANK[priority]
+        backlog = self._queued_ahead(rank) + max(0, self._in_flight - self.max_concurrency + 1)
+        if self._in_flight < self.max_concurrency and backlog == 0:
+            return 0.0
+        return (backlog + self.calls_per_request) * self._avg_service_time / self.max_concurrency
+
+    def check_admission(self, priority: Priority) -> None:
+        """
+        Raises:
+            AdmissionRejectedError: If the estimated queue wait exceeds the class's SLO
+        """
+        estimated_wait = self.estimate_wait(priority)
+        slo = self.queue_slo_seconds.get(priority.value)
+        if slo is not None and estimated_wait > slo:
+            self._rejected[priority] += 1
+            raise AdmissionRejectedError(priority, estimated_wait)
+        self._admitted[priority] += 1
+
+    def _enqueue(self, waiter: _Waiter) -> None:
+        rank = PRIORITY_RANK[waiter.priority]
+        weight = self.tenant_weights.get(waiter.tenant, 1.0)
+        start = max(self._virtual_time.get(rank, 0.0), self._last_finish.get((rank, waiter.tenant), 0.0))
+        finish = start + 1.0 / weight
+        self._last_finish[(rank, waiter.tenant)] = finish
+        heapq.heappush(self._queue, (rank, finish, next(self._sequence), waiter))
+
+    def _dispatch(self) -> None:
+        while self._queue and self._in_flight < self.max_concurrency:
+            rank, finish, _, waiter = heapq.heappop(self._queue)
+            if waiter.cancelled:
+                continue
+            self._virtual_time[rank] = finish
+            self._in_flight += 1
+            wait = time.perf_counter() - waiter.enqueued_at
+            self._avg_wait[waiter.priority] = 0.9 * self._avg_wait[waiter.priority] + 0.1 * wait
+            waiter.future.set_result(None)
+
+    def _release(self, service_time: float) -> None:
+        self._in_flight -= 1
+        self._avg_service_time = 0.9 * self._avg_service_time + 0.1 * service_time
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one LLM call slot, scheduled under the current request context"""
+        priority, tenant = _request_context.get()
+
+        if self._in_flight < self.max_concurrency and not self._queue:
+            self._in_flight += 1
+        else:
+            waiter = _Waiter(priority, tenant, asyncio.get_running_loop().create_future())
+            self._enqueue(waiter)
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                if waiter.future.done() and not waiter.future.cancelled():
+                    # The slot was granted just as we were cancelled; hand it on
+                    self._release(0.0)
+                else:
+                    waiter.cancelled = True
+                raise
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(time.perf_counter() - start)
+
+    def metrics(self) -> dict:
+        queued: Dict[str, int] = {priority.value: 0 for priority in Priority}
+        queued_by_tenant: Dict[str, int] = {}
+        for _, _, _, waiter in self._queue:
+            if waiter.cancelled:
+                continue
+            queued[waiter.priority.value] += 1
+            queued_by_tenant[waiter.tenant] = queued_by_tenant.get(waiter.tenant, 0) + 1
+
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "avg_service_time_seconds": round(self._avg_service_time, 4),
+            "queued": queued,
+            "queued_by_tenant": queued_by_tenant,
+            "estimated_wait_seconds": {
+                priority.value: round(self.estimate_wait(priority), 4) for priority in Priority
+            },
+            "avg_wait_seconds": {
+                priority.value: round(wait, 4) for priority, wait in self._avg_wait.items()
+            },
+            "admitted": {priority.value: count for priority, count in self._admitted.items()},
+            "rejected": {priority.value: count for priority, count in self._rejected.items()},
+        }
+
+
+llm_scheduler = LLMScheduler.from_settings()
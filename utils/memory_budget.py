@@ -0,0 +1,138 @@
+import asyncio
+import math
+import resource
+import sys
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Tuple
+
+from config.settings import get_settings
+
+
+class MemoryBudgetExceededError(Exception):
+    def __init__(self, requested_bytes: int, retry_after: int):
+        self.requested_bytes = requested_bytes
+        self.retry_after = retry_after
+        super().__init__(f"Not enough image memory budget for {requested_bytes} bytes")
+
+
+class ReservationTooLargeError(Exception):
+    """The reservation exceeds the whole budget, so it can never be admitted"""
+
+    def __init__(self, requested_bytes: int, max_bytes: int):
+        self.requested_bytes = requested_bytes
+        self.max_bytes = max_bytes
+        super().__init__(f"Reservation of {requested_bytes} bytes exceeds the {max_bytes} byte image memory budget")
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of the current process"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class ByteBudget:
+    """
+    Global admission control on the memory held by in-flight images.
+
+    Requests reserve an estimate of the bytes they will hold (raw size times an overhead
+    factor for the encoded buffer, request body and response objects). Reservations that
+    don't fit wait, in arrival order, for up to max_wait_seconds and are then rejected.
+    """
+
+    def __init__(self, max_bytes: int, max_wait_seconds: float, overhead_factor: float):
+        self.max_bytes = max_bytes
+        self.max_wait_seconds = max_wait_seconds
+        self.overhead_factor = overhead_factor
+        self._in_flight_bytes = 0
+        self._rejected = 0
+        # Waiting reservations in arrival order; only the head is ever admitted, so a large
+        # reservation isn't overtaken indefinitely by smaller ones that happen to fit
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+
+    @classmethod
+    def from_settings(cls) -> "ByteBudget":
+        settings = get_settings()
+        return cls(
+            max_bytes=settings.image_memory_budget_bytes,
+            max_wait_seconds=settings.image_memory_budget_wait_seconds,
+            overhead_factor=settings.image_memory_overhead_factor,
+        )
+
+    def estimate(self, image_bytes: int) -> int:
+        return math.ceil(image_bytes * self.overhead_factor)
+
+    def _admit_waiters(self) -> None:
+        while self._waiters:
+            requested, future = self._waiters[0]
+            if future.done():
+                # Timed out or cancelled while queued
+                self._waiters.popleft()
+                continue
+            if self._in_flight_bytes + requested > self.max_bytes:
+                return
+            self._waiters.popleft()
+            self._in_flight_bytes += requested
+            future.set_result(None)
+
+    async def _acquire(self, requested: int) -> None:
+        if not self._waiters and self._in_flight_bytes + requested <= self.max_bytes:
+            self._in_flight_bytes += requested
+            return
+
+        waiter = (requested, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout=self.max_wait_seconds)
+        except BaseException as e:
+            if waiter[1].done() and not waiter[1].cancelled():
+                # Admitted just as the wait gave up, hand the bytes back
+                self._release(requested)
+            else:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                # This may have been the head blocking smaller reservations behind it
+                self._admit_waiters()
+            if isinstance(e, asyncio.TimeoutError):
+                self._rejected += 1
+                raise MemoryBudgetExceededError(
+                    requested, retry_after=max(1, math.ceil(self.max_wait_seconds))
+                )
+            raise
+
+    def _release(self, requested: int) -> None:
+        self._in_flight_bytes -= requested
+        self._admit_waiters()
+
+    @asynccontextmanager
+    async def reserve(self, image_bytes: int):
+        """
+        Hold memory budget for images totalling image_bytes while the block runs.
+
+        Raises:
+            ReservationTooLargeError: If the reservation is larger than the whole budget
+            MemoryBudgetExceededError: If the reservation can't fit within max_wait_seconds
+        """
+        requested = self.estimate(image_bytes)
+        if requested > self.max_bytes:
+            self._rejected += 1
+            raise ReservationTooLargeError(requested, self.max_bytes)
+
+        await self._acquire(requested)
+        try:
+            yield
+        finally:
+            self._release(requested)
+
+    def metrics(self) -> dict:
+        return {
+            "max_bytes": self.max_bytes,
+            "in_flight_bytes": self._in_flight_bytes,
+            "waiting": len(self._waiters),
+            "rejected": self._rejected,
+            "peak_rss_bytes": peak_rss_bytes(),
+        }
+
+
+image_memory_budget = ByteBudget.from_settings()
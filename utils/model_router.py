@@ -0,0 +1,175 @@
+import math
+import random
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import get_settings
+
+
+class ModelStats:
+    """Rolling window of call outcomes for one model at one stage"""
+
+    def __init__(self, window: int):
+        # (succeeded, latency_seconds, needs_review, cost_usd)
+        self.outcomes: deque[Tuple[bool, float, bool, float]] = deque(maxlen=window)
+
+    def record(self, succeeded: bool, latency: float, needs_review: bool = False, cost: float = 0.0) -> None:
+        self.outcomes.append((succeeded, latency, needs_review, cost))
+
+    @property
+    def count(self) -> int:
+        return len(self.outcomes)
+
+    @property
+    def success_rate(self) -> float:
+        if not self.outcomes:
+            return 1.0
+        return sum(1 for succeeded, *_ in self.outcomes if succeeded) / len(self.outcomes)
+
+    @property
+    def review_rate(self) -> float:
+        """
+        Share of successful responses with issues (an unsure field for extraction), see
+        query_llm_with_fallbacks. A proxy for the downstream manual-review rate, which is only known
+        after the whole chain has run.
+        """
+        successes = [needs_review for succeeded, _, needs_review, _ in self.outcomes if succeeded]
+        if not successes:
+            return 0.0
+        return sum(successes) / len(successes)
+
+    @property
+    def p95_latency(self) -> Optional[float]:
+        latencies = sorted(latency for _, latency, _, _ in self.outcomes)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, math.ceil(0.95 * len(latencies)) - 1)]
+
+    @property
+    def cost_per_accepted(self) -> Optional[float]:
+        """USD spent on all calls (failed and rejected ones too) per accepted response"""
+        accepted = sum(1 for succeeded, _, needs_review, _ in self.outcomes if succeeded and not needs_review)
+        total_cost = sum(cost for *_, cost in self.outcomes)
+        if not accepted:
+            return math.inf if total_cost else None
+        return total_cost / accepted
+
+    def to_dict(self) -> dict:
+        cost = self.cost_per_accepted
+        return {
+            "count": self.count,
+            "success_rate": self.success_rate,
+            "review_rate": self.review_rate,
+            "p95_latency": self.p95_latency,
+            # Infinite (spent without any accepted response) isn't valid JSON
+            "cost_per_accepted": cost if cost != math.inf else None,
+        }
+
+
+class ModelRouter:
+    """
+    Orders a stage's candidate models from observed success rate, p95 latency, review
+    rate (see ModelStats.review_rate) and cost per accepted response.
+
+    Models within the operator SLOs (or without enough samples yet) come first, cheapest
+    first; models violating an SLO are kept at the end of the chain as fallbacks, most
+    reliable first. A small share of calls keeps the cost order regardless of health, so
+    degraded models keep being sampled and can recover.
+    """
+
+    def __init__(
+        self,
+        model_costs: Dict[str, float],
+        latency_slos: Dict[str, float],
+        cost_slos: Optional[Dict[str, float]] = None,
+        min_success_rate: float = 0.9,
+        max_review_rate: float = 0.3,
+        window: int = 200,
+        min_samples: int = 20,
+        explore_rate: float = 0.05,
+    ):
+        self.model_costs = model_costs
+        self.latency_slos = latency_slos
+        self.cost_slos = cost_slos or {}
+        self.min_success_rate = min_success_rate
+        self.max_review_rate = max_review_rate
+        self.window = window
+        self.min_samples = min_samples
+        self.explore_rate = explore_rate
+        self._stats: Dict[Tuple[str, str], ModelStats] = {}
+        # When False, route() keeps the configured order (e.g. for reproducible replays)
+        self.adaptive = True
+
+    @classmethod
+    def from_settings(cls) -> "ModelRouter":
+        settings = get_settings()
+        return cls(
+            model_costs=settings.llm_model_costs,
+            latency_slos=settings.llm_latency_slo_seconds,
+            cost_slos=settings.llm_cost_slo_usd,
+            min_success_rate=settings.llm_min_success_rate,
+            max_review_rate=settings.llm_max_review_rate,
+            window=settings.llm_router_window,
+            min_samples=settings.llm_router_min_samples,
+            explore_rate=settings.llm_router_explore_rate,
+        )
+
+    def _get_stats(self, stage: str, model: str) -> ModelStats:
+        key = (stage, model)
+        if key not in self._stats:
+            self._stats[key] = ModelStats(self.window)
+        return self._stats[key]
+
+    def _meets_slos(self, stage: str, model: str) -> bool:
+        stats = self._get_stats(stage, model)
+        if stats.count < self.min_samples:
+            return True
+        latency_slo = self.latency_slos.get(stage)
+        if latency_slo is not None and stats.p95_latency > latency_slo:
+            return False
+        cost_slo = self.cost_slos.get(stage)
+        if cost_slo is not None and stats.cost_per_accepted is not None and stats.cost_per_accepted > cost_slo:
+            return False
+        return (
+            stats.success_rate >= self.min_success_rate
+            and stats.review_rate <= self.max_review_rate
+        )
+
+    def route(self, stage: str, models: List[str]) -> List[str]:
+        """Return the candidate models for a stage in the order they should be tried"""
+        if not self.adaptive:
+            return list(models)
+        position = {model: i for i, model in enumerate(models)}
+        if random.random() < self.explore_rate:
+            return sorted(models, key=lambda m: (self.model_costs.get(m, math.inf), position[m]))
+
+        healthy = [model for model in models if self._meets_slos(stage, model)]
+        degraded = [model for model in models if model not in healthy]
+
+        healthy.sort(key=lambda m: (self.model_costs.get(m, math.inf), position[m]))
+        degraded.sort(key=lambda m: (-self._get_stats(stage, m).success_rate, position[m]))
+        return healthy + degraded
+
+    def record(
+        self,
+        stage: str,
+        model: str,
+        succeeded: bool,
+        latency: float,
+        needs_review: bool = False,
+        total_tokens: int = 0,
+    ) -> None:
+        cost = total_tokens * self.model_costs.get(model, 0.0) / 1_000_000
+        self._get_stats(stage, model).record(succeeded, latency, needs_review, cost)
+
+    def snapshot(self) -> dict:
+        snapshot: Dict[str, dict] = {}
+        for (stage, model), stats in self._stats.items():
+            snapshot.setdefault(stage, {})[model] = {
+                **stats.to_dict(),
+                "meets_slos": self._meets_slos(stage, model),
+            }
+        return snapshot
+
+
+model_router = ModelRouter.from_settings()
@@ -1,23 +1,98 @@
-from typing import TypeVar, List, Any, Optional, Type, Dict
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import TypeVar, List, Any, Optional, Type, Dict, Callable, Awaitable
 import os
+import time
 from dotenv import load_dotenv
 from openai import AsyncOpenAI
 from pydantic import BaseModel
 
 from utils.image_utils import encode_image
+from utils.llm_scheduler import llm_scheduler
+from utils.model_router import model_router
 
 load_dotenv()
 
 
-client = AsyncOpenAI(
-    base_url="https://api.fireworks.ai/inference/v1",
-    api_key=os.getenv("FIREWORKS_API_KEY"),
-)
+@lru_cache()
+def get_client() -> AsyncOpenAI:
+    # Created lazily so offline transports (e.g. replayed recordings) need no API key
+    return AsyncOpenAI(
+        base_url="https://api.fireworks.ai/inference/v1",
+        api_key=os.getenv("FIREWORKS_API_KEY"),
+    )
 
 
 T = TypeVar("T", bound=BaseModel)
 
 
+@lru_cache(maxsize=None)
+def get_json_schema(response_schema: Type[BaseModel]) -> Dict[str, Any]:
+    """JSON schema of a response model, generated once per model class"""
+    return response_schema.model_json_schema()
+
+
+class LLMCompletion(BaseModel):
+    content: str
+    usage: Dict[str, int] = {}
+
+
+Transport = Callable[..., Awaitable[LLMCompletion]]
+
+
+async def fireworks_transport(
+    model: str,
+    response_schema: Type[BaseModel],
+    messages: List[Dict[str, Any]],
+    **kwargs,
+) -> LLMCompletion:
+    """Send a structured-output chat completion request to Fireworks"""
+    completion = await get_client().beta.chat.completions.parse(
+        model=model,
+        response_format={
+            "type": "json_object",
+            "schema": get_json_schema(response_schema),
+        },
+        messages=messages,
+        **kwargs,
+    )
+    usage = completion.usage
+    return LLMCompletion(
+        content=completion.choices[0].message.content,
+        usage={
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "total_tokens": usage.total_tokens,
+        } if usage else {},
+    )
+
+
+_transport: Transport = fireworks_transport
+
+# Token usage accumulator for the current task, see track_usage
+_usage: ContextVar[Optional[Dict[str, int]]] = ContextVar("llm_usage", default=None)
+
+
+def set_transport(transport: Transport) -> None:
+    """Replace how completions are fetched, e.g. with recorded responses for offline runs"""
+    global _transport
+    _transport = transport
+
+
+def get_transport() -> Transport:
+    return _transport
+
+
+def track_usage() -> Dict[str, int]:
+    """
+    Start accumulating token usage for LLM calls made by the current task (and tasks it
+    spawns afterwards). Returns the dict that will be updated in place.
+    """
+    usage: Dict[str, int] = {}
+    _usage.set(usage)
+    return usage
+
+
 class ModelFallbackError(Exception):
     """Custom exception for when all models fail"""
 
@@ -30,32 +105,91 @@ async def query_llm_with_fallbacks(
     models: List[str],
     response_schema: Type[T],
     messages: List[Dict[str, Any]],
+    stage: Optional[str] = None,
+    count_issues: Optional[Callable[[T], int]] = None,
     **kwargs,
 ) -> T:
+    """
+    Query each model in turn until one returns a valid response.
+
+    Args:
+        models: Candidate models in capability order, weakest first
+        response_schema: Pydantic model the response must validate against
+        messages: Chat messages to send
+        stage: Pipeline stage name. When given, the model router reorders the candidates
+            from rolling stats and every attempt is recorded against the stage.
+        count_issues: Optional check on a valid response, e.g. its number of unsure fields.
+            A response with issues counts as needing manual review and escalates, but only
+            to models stronger than the one that produced it (the router may have put a
+            weaker one later in the chain); if no model produces a response without
+            issues, the one with the fewest is returned.
+    """
+    capability = {model: rank for rank, model in enumerate(models)}
+    if stage is not None:
+        models = model_router.route(stage, models)
+
     last_exception = None
+    best_response = None
+    best_issues = None
+    min_capability = -1
 
     for model in models:
+        if capability[model] <= min_capability:
+            continue
+        start = time.perf_counter()
+        total_tokens = 0
         try:
-            completion = await client.beta.chat.completions.parse(
-                model=model,
-                response_format={
-                    "type": "json_object",
-                    "schema": response_schema.model_json_schema(),
-                },
-                messages=messages,
-                **kwargs,
-            )
-
-            json_content = completion.choices[0].message.content
-            return response_schema.model_validate_json(json_content)
+            async with llm_scheduler.slot():
+                # Time the model call only, not the wait for a slot
+                start = time.perf_counter()
+                completion = await _transport(
+                    model=model,
+                    response_schema=response_schema,
+                    messages=messages,
+                    **kwargs,
+                )
+
+            total_tokens = completion.usage.get("total_tokens", 0)
+            usage = _usage.get()
+            if usage is not None:
+                for key, value in completion.usage.items():
+                    usage[key] = usage.get(key, 0) + value
+
+            response = response_schema.model_validate_json(completion.content)
 
         except Exception as e:
             last_exception = e
+            if stage is not None:
+                model_router.record(
+                    stage, model, False, time.perf_counter() - start, total_tokens=total_tokens
+                )
             print(
                 f"Model {model} failed with error: {str(e)}. Attempting next model..."
             )
             continue
 
+        issues = count_issues(response) if count_issues else 0
+        accepted = issues == 0
+        if stage is not None:
+            model_router.record(
+                stage,
+                model,
+                True,
+                time.perf_counter() - start,
+                needs_review=not accepted,
+                total_tokens=total_tokens,
+            )
+        if accepted:
+            return response
+
+        if best_issues is None or issues < best_issues:
+            best_response, best_issues = response, issues
+        min_capability = capability[model]
+        print(f"Model {model} response had {issues} issue(s). Escalating to a stronger model...")
+
+    if best_response is not None:
+        return best_response
+
     raise ModelFallbackError(last_exception)
 
 
@@ -0,0 +1,29 @@
+from typing import Any
+
+import orjson
+from bson.objectid import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def _default(obj: Any) -> Any:
+    """Fallback for types orjson does not serialize natively (datetime and Enum are native)"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson, handling ObjectId, datetime and Enum values
+    directly. Return it explicitly from a route to also skip FastAPI's jsonable_encoder pass.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,139 @@
+import asyncio
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import orjson
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from utils.serialization import dumps
+
+
+# Only delete the lock if it is still held by the caller's token
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Only extend the lock if it is still held by the caller's token
+_EXTEND_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("expire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key so only one of them does the work.
+
+    Within a process, duplicates await the same in-flight future. Across workers, a Redis
+    lock elects a single leader; the other workers poll for the leader's result, which is
+    published to Redis for a short time. Results must be JSON-serializable. If Redis is
+    unavailable, coalescing falls back to the current process only.
+
+    The leader keeps extending its lock while the work runs, however long it queues, so
+    lock_ttl only bounds how long a leader that died goes unnoticed.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        redis_client: Optional[Redis] = None,
+        lock_ttl: int = 120,
+        result_ttl: int = 30,
+        poll_interval: float = 0.1,
+    ):
+        self.namespace = namespace
+        self.redis_client = redis_client
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn` unless a call with the same key is already in flight, and return its result"""
+        while (in_flight := self._in_flight.get(key)) is not None:
+            try:
+                return await asyncio.shield(in_flight)
+            except asyncio.CancelledError:
+                # Only our own cancellation propagates; if the leader was cancelled (e.g. its
+                # client disconnected), take over the work instead
+                if not in_flight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        # Mark the exception as retrieved so it isn't logged when there were no duplicates
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._in_flight[key] = future
+
+        try:
+            result = await self._run_across_workers(key, fn)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def _run_across_workers(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if self.redis_client is None:
+            return await fn()
+
+        lock_key = f"{self.namespace}:lock:{key}"
+        result_key = f"{self.namespace}:result:{key}"
+        token = uuid.uuid4().hex
+
+        while True:
+            try:
+                cached = await self.redis_client.get(result_key)
+                if cached is not None:
+                    return orjson.loads(cached)
+                acquired = await self.redis_client.set(
+                    lock_key, token, nx=True, ex=self.lock_ttl
+                )
+            except RedisError as e:
+                print(f"Single-flight Redis error: {str(e)}. Running without cross-worker coalescing...")
+                return await fn()
+
+            if acquired:
+                break
+            # The lock expires if the leader dies, and the next poll takes over
+            await asyncio.sleep(self.poll_interval)
+
+        heartbeat = asyncio.create_task(self._extend_lock(lock_key, token))
+        try:
+            result = await fn()
+            try:
+                await self.redis_client.set(result_key, dumps(result), ex=self.result_ttl)
+            except RedisError as e:
+                print(f"Single-flight failed to publish result: {str(e)}")
+            return result
+        finally:
+            heartbeat.cancel()
+            try:
+                await self.redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+            except RedisError as e:
+                print(f"Single-flight failed to release lock: {str(e)}")
+
+    async def _extend_lock(self, lock_key: str, token: str) -> None:
+        """Keep the leader's lock alive until cancelled"""
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+            try:
+                extended = await self.redis_client.eval(
+                    _EXTEND_LOCK_SCRIPT, 1, lock_key, token, self.lock_ttl
+                )
+            except RedisError as e:
+                print(f"Single-flight failed to extend lock: {str(e)}")
+                continue
+            if not extended:
+                print(f"Single-flight lost lock {lock_key}, another worker may duplicate the work")
+                return
@@ -0,0 +1,166 @@
+import hashlib
+import os
+import tempfile
+from typing import Dict, Optional, Tuple
+
+from fastapi import UploadFile
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+# Allowance for multipart boundaries and part headers on top of the file bytes
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+HEIC_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"heim", b"heis", b"mif1", b"msf1"}
+
+
+class UploadTooLargeError(Exception):
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        super().__init__(f"Upload exceeds the maximum size of {max_bytes} bytes")
+
+
+class UnsupportedImageTypeError(Exception):
+    pass
+
+
+class StreamedUpload(BaseModel):
+    path: str
+    size: int
+    sha256: str
+    mime_type: str
+    extension: str
+
+
+def sniff_image_type(header: bytes) -> Optional[Tuple[str, str]]:
+    """
+    Identify an image format from its leading bytes.
+
+    Returns:
+        (mime_type, extension) for JPEG, PNG, WebP and HEIC images, otherwise None
+    """
+    if header.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg", ".jpg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png", ".png"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp", ".webp"
+    if header[4:8] == b"ftyp" and header[8:12] in HEIC_BRANDS:
+        return "image/heic", ".heic"
+    return None
+
+
+async def stream_upload_to_temp_file(
+    file: UploadFile,
+    max_bytes: int,
+    chunk_size: int = 1024 * 1024,
+) -> StreamedUpload:
+    """
+    Copy an upload to a temporary file in chunks, enforcing a size limit as it goes,
+    sniffing the image type from the first chunk and hashing incrementally so the
+    content hash is ready without a second pass. The caller owns the returned file.
+
+    Raises:
+        UnsupportedImageTypeError: If the first bytes are not a supported image format
+        UploadTooLargeError: As soon as more than max_bytes have been read
+    """
+    await file.seek(0)
+    first_chunk = await file.read(chunk_size)
+    image_type = sniff_image_type(first_chunk[:16])
+    if image_type is None:
+        raise UnsupportedImageTypeError("File must be a JPEG, PNG, WebP or HEIC image")
+    mime_type, extension = image_type
+
+    digest = hashlib.sha256()
+    size = 0
+    temp_file_path = None
+
+    try:
+        with tempfile.NamedTemporaryFile(suffix=extension, delete=False) as temp_file:
+            temp_file_path = temp_file.name
+            chunk = first_chunk
+            while chunk:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(max_bytes)
+                digest.update(chunk)
+                temp_file.write(chunk)
+                chunk = await file.read(chunk_size)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+    except BaseException:
+        if temp_file_path and os.path.exists(temp_file_path):
+            os.unlink(temp_file_path)
+        raise
+
+    return StreamedUpload(
+        path=temp_file_path,
+        size=size,
+        sha256=digest.hexdigest(),
+        mime_type=mime_type,
+        extension=extension,
+    )
+
+
+class RequestSizeLimitMiddleware:
+    """
+    Reject request bodies over a per-path byte limit with 413 before the app reads them.
+
+    FastAPI parses (and spools to disk) the whole multipart form before a handler runs, so
+    the limit can't be enforced in the handler. Content-Length is checked before the app is
+    called; bodies without one (chunked) are counted as they are received, and the app's
+    read is aborted as soon as the limit is crossed.
+    """
+
+    def __init__(self, app: ASGIApp, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send, max_bytes: int) -> None:
+        response = JSONResponse(
+            {"detail": f"Request body exceeds the maximum size of {max_bytes} bytes"},
+            status_code=413,
+        )
+        await response(scope, receive, send)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        max_bytes = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if max_bytes is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > max_bytes:
+            await self._reject(scope, receive, send, max_bytes)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    exceeded = True
+                    raise UploadTooLargeError(max_bytes)
+            return message
+
+        async def guarded_send(message: Message) -> None:
+            nonlocal response_started
+            # Drop the error response the app builds for the aborted read, the 413 replaces it
+            if exceeded and not response_started:
+                return
+            response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not response_started:
+            await self._reject(scope, receive, send, max_bytes)